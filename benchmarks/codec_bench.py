@@ -0,0 +1,96 @@
+# codec_bench.py
+# JSON kodlayıcı karşılaştırması - gerçek oyun mesajlarıyla
+#
+# Kullanım:
+#   python benchmarks/codec_bench.py
+#   python benchmarks/codec_bench.py --players 60 --repeat 2000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from lan.lan_server import available_json_codecs
+
+NAMES = ["Çağrı", "Şule", "Gökhan", "Ayşe", "İlker", "Özge", "Ümit", "Tamer", "Eda", "Barış"]
+
+def make_players(n):
+    return [{"id": f"p{i + 1}", "name": f"{random.choice(NAMES)} {i}", "score": random.randint(0, 300)}
+            for i in range(n)]
+
+def tombala_card():
+    # Sıkıştırılmış kart: satır satır 15 sayı
+    return [num for _ in range(3) for num in sorted(random.sample(range(1, 91), 5))]
+
+def sample_payloads(n_players):
+    """Oyunların gönderdiği mesajlarla aynı yapıda örnekler"""
+    players = make_players(n_players)
+    drawn = random.sample(range(1, 91), 60)
+    return {
+        "tombala state": {
+            "type": "state", "v": 120, "players": players, "started": True,
+            "drawn_numbers": drawn, "last_number": drawn[-1], "total_drawn": len(drawn),
+            "cinko1_winner": players[0]["id"], "cinko2_winner": None, "tombala_winner": None,
+        },
+        "tombala your_card": {"type": "your_card", "cards": [tombala_card() for _ in range(3)]},
+        "tombala number_drawn": {"type": "number_drawn", "number": 42, "total": 61},
+        "kkm round_end": {
+            "type": "round_end", "triplet": ["Jett", "Sage", "Omen"],
+            "choices": {p["id"]: [0, 1, 2] for p in players},
+            "points": {p["id"]: random.choice((0, 1, 2, 4)) for p in players},
+            "tally": {"kiss": [50, 25, 25], "kill": [25, 50, 25], "marry": [25, 25, 50]},
+        },
+        "trustnoone state": {
+            "type": "state", "v": 57,
+            "players": [dict(p, alive=random.random() > 0.2) for p in players],
+            "started": True, "phase": "meeting", "progress": 48, "round": 6,
+            "current_task": "Firewall Check", "timer": 12, "alive_count": n_players - 3,
+            "eliminated": [players[1]["id"], players[2]["id"], players[3]["id"]],
+        },
+        "inbound vote": {"type": "vote", "target": players[5]["id"]},
+    }
+
+def bench(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best / repeat * 1e6  # µs
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON kodlayıcı karşılaştırması")
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    codecs = available_json_codecs()
+    payloads = sample_payloads(args.players)
+    baseline = codecs[-1]  # standart json her zaman sonda
+
+    print(f"Kodlayıcılar: {', '.join(c.name for c in codecs)} · {args.players} oyuncu")
+    print(f"{'mesaj':<22}{'boyut':>8}  " + "".join(f"{c.name + ' enc/dec µs':>24}" for c in codecs))
+    for label, obj in payloads.items():
+        encoded = {c.name: c.dumps(obj) for c in codecs}
+        raw = baseline.dumps(obj).encode("utf-8")
+        # Tüm kodlayıcılar aynı veriyi üretmeli
+        for c in codecs:
+            out = encoded[c.name]
+            assert baseline.loads(out) == obj, c.name
+        cells = []
+        for c in codecs:
+            enc = bench(c.dumps, obj, args.repeat)
+            dec = bench(c.loads, raw, args.repeat)
+            speedup = ""
+            if c is not baseline:
+                base_total = bench(baseline.dumps, obj, args.repeat) + bench(baseline.loads, raw, args.repeat)
+                speedup = f" (x{base_total / (enc + dec):.1f})"
+            cells.append(f"{enc:.1f}/{dec:.1f}{speedup}")
+        print(f"{label:<22}{len(raw):>8}  " + "".join(f"{cell:>24}" for cell in cells))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# join_bench.py
+# Toplu katılım yük testi - QR kodu okutan ya da modem yeniden başlayınca geri bağlanan kalabalık
+#
+# Kullanım:
+#   python benchmarks/join_bench.py
+#   python benchmarks/join_bench.py --clients 300 --target 3
+#   python benchmarks/join_bench.py --admit-rate 0      # kabul sırası kapalı
+#
+# Sunucu ayrı bir süreçte başlatılır. Tüm istemciler aynı anda bağlanıp "join"
+# gönderir; her istemcinin oyuncu listesinde herkesi gördüğü ana kadar geçen
+# süre (oturma süresi) ve istemci başına gelen mesaj sayısı ölçülür.
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import lan.lan_server as server
+from loop_bench import wait_port
+
+def serve(port, admit_rate):
+    server.ADMIT_RATE = admit_rate
+    server.run_server(server.create_app(), port=port, workers=1)
+
+class Client:
+    """Yalnızca oyuncu listesini izleyen hafif istemci"""
+
+    def __init__(self):
+        self.players = set()
+        self.v = None
+        self.messages = 0
+        self.joined = None      # "joined" gelene kadar geçen süre
+        self.settled = None     # listede herkesin görüldüğü an
+
+    def apply(self, msg, ws):
+        if msg["type"] == "state":
+            self.v = msg["v"]
+            self.players = {p["id"] for p in msg.get("players", ())}  # boş odada durum henüz yok
+            return
+        if msg["type"] != "state_patch":
+            return
+        if msg["base"] != self.v:
+            # Yama kaçtı: tam durumu iste
+            self.v = None
+            return ws.send_str('{"type":"state_sync"}')
+        if "players" in msg.get("set", {}):
+            self.players = {p["id"] for p in msg["set"]["players"]}
+        self.players.update(p["id"] for p in msg.get("append", {}).get("players", ()))
+        ops = msg.get("items", {}).get("players")
+        if ops:
+            self.players.difference_update(ops["remove"])
+            self.players.update(p["id"] for p in ops["upsert"])
+        self.v = msg["v"]
+
+async def run_clients(port, clients, timeout):
+    import aiohttp
+
+    url = f"http://127.0.0.1:{port}/ws"
+    conns = [Client() for _ in range(clients)]
+    everyone_in = asyncio.Event()
+    settled = 0
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        async def run(i, client):
+            nonlocal settled
+            ws = await session.ws_connect(url, compress=0)
+            await ws.send_json({"type": "join", "name": f"Oyuncu {i}"})
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                client.messages += 1
+                data = json.loads(msg.data)
+                if data["type"] == "joined":
+                    client.joined = time.perf_counter() - start
+                pending = client.apply(data, ws)
+                if pending is not None:
+                    await pending
+                if client.settled is None and client.joined is not None and len(client.players) == clients:
+                    client.settled = time.perf_counter() - start
+                    settled += 1
+                    if settled == clients:
+                        everyone_in.set()
+                if everyone_in.is_set():
+                    break
+            return ws
+
+        start = time.perf_counter()
+        tasks = [asyncio.ensure_future(run(i, c)) for i, c in enumerate(conns)]
+        try:
+            await asyncio.wait_for(everyone_in.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return conns
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description="Toplu katılım yük testi")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--target", type=float, default=2.0, help="hedef oturma süresi (sn)")
+    parser.add_argument("--admit-rate", type=int, default=server.ADMIT_RATE,
+                        help="saniyede kabul edilen el sıkışması (0: sınırsız)")
+    parser.add_argument("--port", type=int, default=8792)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.admit_rate)
+        return
+
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "--serve", "--port", str(args.port), "--admit-rate", str(args.admit_rate)],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        wait_port(args.port)
+        conns = asyncio.run(run_clients(args.port, args.clients, timeout=max(10.0, 5 * args.target)))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    joined = [c.joined for c in conns if c.joined is not None]
+    settled = [c.settled for c in conns if c.settled is not None]
+    messages = sum(c.messages for c in conns)
+    print(f"{args.clients} istemci · kabul hızı {args.admit_rate or 'sınırsız'}/s · STATE_TICK {server.STATE_TICK * 1000:.0f} ms")
+    print(f"katılım (joined)   p50 {percentile(joined, .5) * 1000:7.0f} ms   p95 {percentile(joined, .95) * 1000:7.0f} ms")
+    print(f"oturma (herkes)    p50 {percentile(settled, .5) * 1000:7.0f} ms   en geç {max(settled, default=float('nan')) * 1000:7.0f} ms")
+    print(f"mesaj              istemci başına {messages / args.clients:.1f} · toplam {messages}")
+    ok = len(settled) == args.clients and max(settled) <= args.target
+    print(f"{'BAŞARILI' if ok else 'BAŞARISIZ'}: {len(settled)}/{args.clients} istemci {args.target:.1f} sn hedefinde")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# loop_bench.py
+# Olay döngüsü karşılaştırması (asyncio / uvloop) - bağlantı kabulü ve yayın hızı
+#
+# Kullanım:
+#   python benchmarks/loop_bench.py
+#   python benchmarks/loop_bench.py --clients 300 --messages 200
+#
+# Her döngü için sunucu ayrı bir süreçte `--loop` ile başlatılır; istemciler
+# bu süreçte standart asyncio ile çalışır, böylece yalnızca sunucu tarafı değişir.
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import lan.lan_server as server
+
+def serve(port, loop, queue):
+    """Sunucu süreci: {"type": "bench"} gelince `count` mesaj yayınlar"""
+    server.OUTBOX_SIZE = queue
+
+    async def handle_game_message(ws, data):
+        if data.get("type") == "bench":
+            pad = "x" * data.get("size", 64)
+            for i in range(data.get("count", 100)):
+                await server.broadcast(server.build_payload("tick", i=i, pad=pad))
+                await asyncio.sleep(0)
+
+    app = server.create_app(game=server.Game("bench", None, handle_message=handle_game_message))
+    server.run_server(app, port=port, workers=1, loop=loop)
+
+def wait_port(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Sunucu {port} portunda açılmadı")
+
+async def run_clients(port, clients, messages, size):
+    import aiohttp
+
+    url = f"http://127.0.0.1:{port}/ws"
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        # Bağlantı kabulü: hepsi aynı anda bağlanır, "hello" gelene kadar süre ölçülür
+        async def connect():
+            ws = await session.ws_connect(url, compress=0)
+            await ws.receive()  # hello
+            await ws.receive()  # state
+            return ws
+
+        start = time.perf_counter()
+        conns = await asyncio.gather(*(connect() for _ in range(clients)))
+        accept = time.perf_counter() - start
+
+        # Yayın: tek istek, her istemci `messages` mesajın tamamını alana kadar
+        async def consume(ws):
+            got = 0
+            while got < messages:
+                msg = await ws.receive()
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    raise RuntimeError("Bağlantı kapandı")
+                if msg.data.startswith('{"type":"tick"'):
+                    got += 1
+
+        start = time.perf_counter()
+        waiters = [asyncio.ensure_future(consume(ws)) for ws in conns]
+        await conns[0].send_json({"type": "bench", "count": messages, "size": size})
+        await asyncio.gather(*waiters)
+        spread = time.perf_counter() - start
+
+        await asyncio.gather(*(ws.close() for ws in conns))
+    return accept, spread
+
+def main():
+    parser = argparse.ArgumentParser(description="Olay döngüsü karşılaştırması")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--size", type=int, default=64, help="mesaj başına dolgu (bayt)")
+    parser.add_argument("--port", type=int, default=8791)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--loop", default="asyncio", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.loop, args.messages + 16)
+        return
+
+    loops = ["asyncio"]
+    if server.uvloop is not None and sys.platform != "win32":
+        loops.append("uvloop")
+    else:
+        print("uvloop kurulu değil (pip install uvloop); yalnızca asyncio ölçülüyor")
+
+    print(f"{args.clients} istemci · {args.messages} mesaj · {args.size} bayt dolgu")
+    print(f"{'döngü':<10}{'kabul (bağlantı/s)':>22}{'yayın (mesaj/s)':>20}")
+    for loop in loops:
+        proc = subprocess.Popen(
+            [sys.executable, __file__, "--serve", "--loop", loop, "--port", str(args.port),
+             "--messages", str(args.messages)],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            wait_port(args.port)
+            accept, spread = asyncio.run(run_clients(args.port, args.clients, args.messages, args.size))
+        finally:
+            proc.terminate()
+            proc.wait()
+        delivered = args.clients * args.messages
+        print(f"{loop:<10}{args.clients / accept:>22.0f}{delivered / spread:>20.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -88,6 +88,7 @@ def build_exe():
         "--name=K-LAN",                 # Çıktı dosya adı
         "--add-data=games;games",       # games klasörünü dahil et
         "--add-data=lan;lan",           # lan klasörünü dahil et
+        "--add-data=hub.py;.",          # Oyun merkezi başlatıcısı
         "--add-data=README.md;.",       # README'yi dahil et
         "--clean",                      # Önceki build'leri temizle
         "main.py"
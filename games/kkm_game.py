@@ -1,7 +1,6 @@
 # kkm_game.py
 # Kiss-Kill-Marry Oyunu - Valorant Edition
 
-import asyncio
 import os
 import random
 import sys
@@ -9,114 +8,257 @@ import sys
 # LAN server modülünü ekle
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from lan.lan_server import (
-    create_app, run_server, broadcast, build_payload, 
-    players, player_by_ws, clients, send_state
+    create_app, run_server, broadcast, build_payload, publish_state, mark_dirty, RoomLocal, Game,
+    set_timer, cancel_timer,
+    players, player_by_ws, ws_by_player, clients
 )
 
 ROUND_TIME_LIMIT = 180  # saniye; istersen kapat (None)
+LIVE_TALLY = False      # True: tur sürerken seçim yüzdeleri herkese gösterilir
+
+# Skor kuralı: aynı eşleşmeyi paylaşan herkes + Kiss=1, Kill=1, Marry=2
+ROLES = ("kiss", "kill", "marry")
+ROLE_POINTS = {"kiss": 1, "kill": 1, "marry": 2}
+
+# --- Karakter katalogları ---
+# "valorant" kataloğu games/character.txt'den, diğerleri games/catalogs/<ad>.txt'den okunur.
+# Kataloglar ilk kullanıldıklarında yüklenip önbellekte tutulur; dosya diskte
+# değişirse (mtime) bir sonraki dağıtımda yeniden okunur, sunucuyu yeniden başlatmaya gerek yok.
+DEFAULT_CATALOG = "valorant"
+CATALOG_DIR = os.path.join(os.path.dirname(__file__), "catalogs")
 
-# --- Karakterleri yükle ---
 DEFAULT_CHARACTERS = [
     "Jett","Phoenix","Sage","Omen","Raze","Sova","Killjoy","Cypher","Brimstone",
     "Viper","Reyna","Skye","Yoru","Astra","Kay/O","Chamber","Neon","Fade","Harbor",
     "Gekko","Deadlock","Iso","Clove"
 ]
 
-def load_characters():
-    # games klasöründe character.txt'yi ara
-    base_path = os.path.dirname(__file__)
-    path = os.path.join(base_path, "character.txt")
+_catalogs = {}  # ad -> (mtime, isim listesi)
+_catalog_list = (None, [DEFAULT_CATALOG])  # (klasör mtime, katalog adları)
+
+def catalog_path(name):
+    if name == DEFAULT_CATALOG:
+        return os.path.join(os.path.dirname(__file__), "character.txt")
+    return os.path.join(CATALOG_DIR, name + ".txt")
+
+def catalog_names():
+    """Seçilebilir kataloglar (varsayılan her zaman ilk sırada)"""
+    global _catalog_list
+    try:
+        mtime = os.stat(CATALOG_DIR).st_mtime_ns
+    except OSError:
+        mtime = None
+    if _catalog_list[0] != mtime:
+        names = [DEFAULT_CATALOG]
+        if mtime is not None:
+            for file in sorted(os.listdir(CATALOG_DIR)):
+                stem, ext = os.path.splitext(file)
+                if ext == ".txt" and stem != DEFAULT_CATALOG:
+                    names.append(stem)
+        _catalog_list = (mtime, names)
+    return _catalog_list[1]
+
+def read_catalog(path):
     chars = []
-    if os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            for line in f:
-                name = line.strip()
-                if name:
-                    chars.append(name)
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            name = line.strip()
+            if name and name not in seen:
+                seen.add(name)
+                chars.append(name)
+    return chars
+
+def load_catalog(name):
+    """Kataloğu önbellekten ver; dosya değiştiyse yeniden oku"""
+    path = catalog_path(name)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    cached = _catalogs.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    chars = read_catalog(path) if mtime is not None else []
     if len(chars) < 3:
+        if name != DEFAULT_CATALOG:
+            return load_catalog(DEFAULT_CATALOG)
         chars = DEFAULT_CHARACTERS[:]  # yedek liste
+    _catalogs[name] = (mtime, chars)
     return chars
 
-CHARACTERS = load_characters()
-
-# --- Oyun durumu ---
-current_round = None           # {"triplet": [a,b,c], "choices": {pid: {"kiss":i,"kill":i,"marry":i}}, "open": bool}
-round_index = 0
+# --- Oyun durumu (oda başına) ---
+game_state = RoomLocal(lambda: {
+    "current_round": None,     # {"triplet": [a,b,c], "choices": {pid: (kiss, kill, marry)}, "open": bool, ...}
+    "round_index": 0,
+    "catalog": DEFAULT_CATALOG,
+    # Deste: kataloğun karıştırılmış bir permütasyonu; sondan üçer üçer dağıtılır
+    "deck": [],
+    "dealt": set(),            # bu permütasyonda dağıtılmış isimler
+    "deck_source": None,       # destenin kurulduğu katalog listesi (yeniden yükleme tespiti)
+})
 
-def pick_unique_three():
-    triplet = random.sample(CHARACTERS, 3)
+def deal_triplet():
+    """Desteden tekrar etmeyen üç isim dağıt; deste bitince yeniden karıştır"""
+    chars = load_catalog(game_state["catalog"])
+    deck = game_state["deck"]
+    dealt = game_state["dealt"]
+    if game_state["deck_source"] is not chars:
+        # Katalog yeniden yüklendi: dağıtılmamış isimlerle desteyi yeniden kur
+        dealt.intersection_update(chars)
+        deck[:] = [name for name in chars if name not in dealt]
+        random.shuffle(deck)
+        game_state["deck_source"] = chars
+    if len(deck) < 3:
+        # Deste bitti: yeni permütasyon, kalanlar önce dağıtılır
+        leftover = set(deck)
+        rest = [name for name in chars if name not in leftover]
+        random.shuffle(rest)
+        deck[:0] = rest
+        dealt.clear()
+    triplet = [deck.pop(), deck.pop(), deck.pop()]
+    dealt.update(triplet)
     return triplet
 
+def set_catalog(name):
+    """Odanın kataloğunu değiştir; deste bir sonraki turda yeni katalogdan kurulur"""
+    if name not in catalog_names() or name == game_state["catalog"]:
+        return
+    game_state["catalog"] = name
+    game_state["deck"].clear()
+    game_state["dealt"].clear()
+    game_state["deck_source"] = None
+    mark_dirty()
+
 async def send_state():
     # oyuncu listesi + skorlar
+    current_round = game_state["current_round"]
     state = {
         "players": [{"id": pid, "name": p["name"], "score": p["score"]} for pid, p in players.items()],
-        "round_index": round_index,
+        "round_index": game_state["round_index"],
         "round_open": bool(current_round and current_round.get("open")),
         "triplet": current_round["triplet"] if current_round else None,
+        "catalog": game_state["catalog"],
+        "catalogs": catalog_names(),
+        "submitted": len(current_round["choices"]) if current_round else 0,
+        "tally": round_tally(current_round) if LIVE_TALLY and current_round and current_round.get("open") else None,
     }
-    await broadcast(build_payload("state", **state))
+    await publish_state(state)
 
 async def start_round():
-    global current_round, round_index
-    round_index += 1
-    triplet = pick_unique_three()
-    current_round = {"triplet": triplet, "choices": {}, "open": True}
+    game_state["round_index"] += 1
+    round_index = game_state["round_index"]
+    triplet = deal_triplet()
+    game_state["current_round"] = {
+        "triplet": triplet,
+        "choices": {},   # pid -> (kiss, kill, marry) indeksleri
+        "open": True,
+        # Sayaçlar gönderim geldikçe güncellenir: rol -> indeks -> o eşleşmeyi seçenler
+        "members": {role: [set(), set(), set()] for role in ROLES},
+        "points": {},    # pid -> bu turda kazanılan ortaklık puanı
+    }
     await broadcast(build_payload("round_start", round_index=round_index, triplet=triplet))
-    await send_state()
+    mark_dirty()
     if ROUND_TIME_LIMIT:
-        asyncio.create_task(round_timeout(round_index))
+        # Yeni tur, önceki turun bekleyen zamanlayıcısının yerini alır
+        set_timer("round", ROUND_TIME_LIMIT, round_timeout, round_index)
 
 async def round_timeout(idx):
-    await asyncio.sleep(ROUND_TIME_LIMIT)
     # süre dolduysa ve hâlâ aynı round açıksa kapat
-    if current_round and current_round.get("open") and round_index == idx:
+    current_round = game_state["current_round"]
+    if current_round and current_round.get("open") and game_state["round_index"] == idx:
         await end_round()
 
 def all_submitted():
+    current_round = game_state["current_round"]
     if not current_round: return False
-    return len(current_round["choices"]) >= len(players) and len(players) > 0
+    # Bağlantısı kopan (yeniden bağlanması beklenen) oyuncular beklenmez
+    connected = list(ws_by_player)
+    choices = current_round["choices"]
+    return bool(connected) and all(pid in choices for pid in connected)
+
+async def player_disconnected(pid):
+    # Kopan oyuncu beklenen son kişiyse turu bitir
+    current_round = game_state["current_round"]
+    if current_round and current_round.get("open") and all_submitted():
+        await end_round()
+
+def _join_bucket(current_round, pid, role, idx):
+    """Seçimi sayaca ekle; eşleşme paylaşılır hale gelirse puanları güncelle"""
+    members = current_round["members"][role][idx]
+    points = current_round["points"]
+    weight = ROLE_POINTS[role]
+    if len(members) == 1:
+        # Yalnız seçen artık eşleşmeyi paylaşıyor
+        (other,) = members
+        points[other] += weight
+    points.setdefault(pid, 0)
+    if members:
+        points[pid] += weight
+    members.add(pid)
+
+def _leave_bucket(current_round, pid, role, idx):
+    """Eski seçimi sayaçtan çıkar (yeniden gönderim)"""
+    members = current_round["members"][role][idx]
+    points = current_round["points"]
+    weight = ROLE_POINTS[role]
+    members.discard(pid)
+    if members:
+        points[pid] -= weight
+        if len(members) == 1:
+            # Geride kalan tek kişi ortaklık puanını kaybeder
+            (other,) = members
+            points[other] -= weight
+
+def round_tally(current_round):
+    """Rol başına her isim için seçim yüzdeleri: {"kiss": [%, %, %], ...}"""
+    total = len(current_round["choices"])
+    if not total:
+        return {role: [0, 0, 0] for role in ROLES}
+    return {role: [round(100 * len(m) / total) for m in current_round["members"][role]] for role in ROLES}
 
 async def end_round():
-    global current_round
+    current_round = game_state["current_round"]
     if not current_round: 
         return
+    cancel_timer("round")
     current_round["open"] = False
-    # eksik verenler için boş bırak (puan yok)
-    # Skor kuralı: Aynı eşleşmeleri paylaşan herkes + Kiss=1, Kill=1, Marry=2
-    # Eşleşmelerin kaç kişi tarafından seçildiğine bakıp ortaklık puanı dağıtacağız.
-    choices = current_round["choices"]  # pid -> {"kiss":i,"kill":i,"marry":i}
-    if choices:
-        # Sıklık tabloları
-        from collections import defaultdict
-        freq = {"kiss":[0,0,0],"kill":[0,0,0],"marry":[0,0,0]}
-        for pid, ch in choices.items():
-            for key in ("kiss","kill","marry"):
-                idx = ch.get(key)
-                if idx in (0,1,2):
-                    freq[key][idx] += 1
-
-        # Her oyuncuya ortaklık puanı
-        for pid, ch in choices.items():
-            sc = 0
-            if "kiss" in ch:   sc += 1 if freq["kiss"][ch["kiss"]]   > 1 else 0
-            if "kill" in ch:   sc += 1 if freq["kill"][ch["kill"]]   > 1 else 0
-            if "marry" in ch:  sc += 2 if freq["marry"][ch["marry"]] > 1 else 0
+    # Puanlar gönderimler sırasında hesaplandı; burada yalnızca skorlara eklenir.
+    # Eksik verenler sayaçlarda yok (puan yok).
+    points = current_round["points"]
+    for pid, sc in points.items():
+        if sc and pid in players:
             players[pid]["score"] += sc
 
-    # Tur sonucu yayınla
-    await broadcast(build_payload("round_end", triplet=current_round["triplet"], choices=choices, players=players))
-    await send_state()
+    # Tur sonucu yayınla: seçimler [kiss, kill, marry] dizisi, isimler durumdaki oyuncu listesinden
+    await broadcast(build_payload(
+        "round_end", triplet=current_round["triplet"],
+        choices={pid: list(ch) for pid, ch in current_round["choices"].items()},
+        points=points, tally=round_tally(current_round),
+    ))
+    mark_dirty()
 
 async def handle_submit(pid, data):
     # data: {"kiss":0..2, "kill":0..2, "marry":0..2}
+    current_round = game_state["current_round"]
     if not current_round or not current_round.get("open"):
         return
     k = data.get("kiss"); l = data.get("kill"); m = data.get("marry")
     valid = {0,1,2}
     if k in valid and l in valid and m in valid and len({k,l,m}) == 3:
-        current_round["choices"][pid] = {"kiss":k, "kill":l, "marry":m}
-        await broadcast(build_payload("partial", who=pid, submitted=len(current_round["choices"]), total=len(players)))
+        choice = (k, l, m)
+        old = current_round["choices"].get(pid)
+        if old == choice:
+            return
+        if old:
+            # Yeniden gönderim: önce eski seçimi sayaçlardan düş
+            for role, idx in zip(ROLES, old):
+                _leave_bucket(current_round, pid, role, idx)
+        for role, idx in zip(ROLES, choice):
+            _join_bucket(current_round, pid, role, idx)
+        current_round["choices"][pid] = choice
+        # Gönderen sayısı (ve açıksa yüzdeler) durum yamasıyla, birleştirilerek gider
+        mark_dirty()
         if all_submitted():
             await end_round()
 
@@ -129,16 +271,15 @@ async def handle_game_message(ws, data):
         # herhangi biri başlatabilir; gerçek hayatta host kontrolü eklenebilir
         await start_round()
 
+    elif typ == "set_catalog":
+        set_catalog(data.get("name"))
+
     elif typ == "submit":
         pid = player_by_ws.get(ws)
         if not pid:
             return
         await handle_submit(pid, data.get("data") or {})
 
-# LAN server'ın handle_game_message fonksiyonunu override et
-import lan.lan_server as lan_module
-lan_module.handle_game_message = handle_game_message
-lan_module.send_state = send_state
 
 # --- HTML Arayüzü ---
 INDEX_HTML = r"""<!doctype html>
@@ -152,7 +293,7 @@ INDEX_HTML = r"""<!doctype html>
     .wrap{max-width:900px;margin:0 auto;padding:20px}
     h1{font-size:20px;margin:0 0 12px}
     .card{background:#171a33;border:1px solid #2a2d4f;border-radius:14px;padding:16px;margin:10px 0;box-shadow:0 6px 14px rgba(0,0,0,.2)}
-    input,button{padding:10px 12px;border-radius:10px;border:1px solid #2a2d4f;background:#0e1124;color:#e9ecff}
+    input,button,select{padding:10px 12px;border-radius:10px;border:1px solid #2a2d4f;background:#0e1124;color:#e9ecff}
     button{cursor:pointer}
     .row{display:flex;gap:8px;flex-wrap:wrap}
     .pill{background:#0e1124;border:1px dashed #333759;padding:6px 10px;border-radius:999px;font-size:12px}
@@ -178,13 +319,14 @@ INDEX_HTML = r"""<!doctype html>
         <input id="name" placeholder="İsmin (örn. Tamer)" />
         <button id="joinBtn">Odaya Katıl</button>
         <button id="hostStartBtn" title="Yeni tur başlat (sadece bir kişi sunsun)">Yeni Tur Başlat</button>
+        <select id="catalog" title="Karakter kataloğu"></select>
       </div>
       <div class="footer">Bu sayfayı aynı ağdaki herkes açabilir: <span id="hostUrl" class="pill"></span></div>
     </div>
 
     <div id="state" class="card">
       <div class="row" id="players"></div>
-      <div class="muted">Tur: <span id="roundIdx">0</span> · Durum: <span id="roundOpen">kapalı</span></div>
+      <div class="muted">Tur: <span id="roundIdx">0</span> · Durum: <span id="roundOpen">kapalı</span> · Gönderen: <span id="submitted">0</span>/<span id="total">0</span></div>
     </div>
 
     <div id="round" class="card" style="display:none">
@@ -195,8 +337,9 @@ INDEX_HTML = r"""<!doctype html>
     <div id="log" class="card" style="display:none"></div>
   </div>
 
+<script src="lan_state.js"></script>
 <script>
-let ws, pid=null, currentTriplet = null, myPick = {kiss:null, kill:null, marry:null};
+let ws, pid=null, currentTriplet = null, myPick = {kiss:null, kill:null, marry:null}, names = {}, shownRound = 0;
 
 function $(id){return document.getElementById(id)}
 function log(msg){
@@ -227,7 +370,8 @@ function renderTriplet(names){
         <button class="cbtn" data-role="kill" data-idx="${idx}">Kill</button>
         <button class="cbtn" data-role="marry" data-idx="${idx}">Marry</button>
       </div>
-      <div class="muted" id="sel-${idx}">Seçilmedi</div>`;
+      <div class="muted" id="sel-${idx}">Seçilmedi</div>
+      <div class="muted" id="tally-${idx}"></div>`;
     el.appendChild(box);
   });
   el.querySelectorAll(".cbtn").forEach(btn=>{
@@ -252,45 +396,69 @@ function renderTriplet(names){
   });
 }
 
+function renderCatalogs(list, current){
+  const el = $("catalog");
+  if(el.dataset.list !== list.join("|")){
+    el.dataset.list = list.join("|");
+    el.innerHTML = list.map(c=>`<option value="${c}">${c}</option>`).join("");
+  }
+  el.value = current;
+}
+function renderTally(tally){
+  if(!currentTriplet) return;
+  for(let i=0;i<3;i++){
+    const el = $("tally-"+i);
+    if(el) el.textContent = tally ? `Kiss %${tally.kiss[i]} · Kill %${tally.kill[i]} · Marry %${tally.marry[i]}` : "";
+  }
+}
+
 function connect(){
-  const proto = location.protocol==="https:" ? "wss" : "ws";
-  ws = new WebSocket(proto + "://" + location.host + "/ws");
-  ws.onopen = ()=>{ if(pid){ ws.send(JSON.stringify({type:"resume", pid:pid})); } };
+  ws = LanWire.open();
+  // Oturum varsa (kopma ya da sayfa yenileme) aynı oyuncu olarak geri dön
+  ws.onopen = ()=>{ LanSession.resume(ws); };
   ws.onmessage = (ev)=>{
     try{
-      const msg = JSON.parse(ev.data);
+      const msg = LanWire.decode(ev.data);
       if(msg.type==="hello"){ /* ignore */ }
-      if(msg.type==="joined"){ pid = msg.pid; log("Katıldın: "+msg.name); }
-      if(msg.type==="state"){
-        renderPlayers(msg.players||[]);
-        $("roundIdx").textContent = msg.round_index||0;
-        $("roundOpen").textContent = msg.round_open ? "açık" : "kapalı";
-        if(msg.triplet && msg.round_open){ $("round").style.display="block"; renderTriplet(msg.triplet); }
+      if(msg.type==="joined"){ pid = msg.pid; LanSession.save(msg); log((msg.resumed ? "Geri döndün: " : "Katıldın: ")+msg.name); }
+      if(msg.type==="resume_failed"){ pid = null; LanSession.clear(); log("<span class='warn'>Oturum süresi doldu, yeniden katıl.</span>"); }
+      if(msg.type==="state" || msg.type==="state_patch"){
+        const st = LanState.apply(msg, ws);
+        if(st){
+          renderPlayers(st.players||[]);
+          (st.players||[]).forEach(p=>{ names[p.id] = p.name; });
+          $("roundIdx").textContent = st.round_index||0;
+          $("roundOpen").textContent = st.round_open ? "açık" : "kapalı";
+          renderCatalogs(st.catalogs||[], st.catalog);
+          $("submitted").textContent = st.submitted||0;
+          $("total").textContent = (st.players||[]).length;
+          // Yalnızca yeni turda çiz; gönderim sayacı değişince seçimler sıfırlanmasın
+          if(st.triplet && st.round_open && st.round_index !== shownRound){ shownRound = st.round_index; $("round").style.display="block"; renderTriplet(st.triplet); }
+          renderTally(st.tally);
+        }
       }
       if(msg.type==="round_start"){
         $("round").style.display="block";
+        shownRound = msg.round_index;
         renderTriplet(msg.triplet);
         log("<b>Yeni Tur #" + msg.round_index + "</b>");
       }
-      if(msg.type==="partial"){
-        log("Gönderen sayısı: " + msg.submitted + "/" + msg.total);
-      }
       if(msg.type==="round_end"){
         const t = msg.triplet;
         const lines = [];
         lines.push("<div><b>Tur bitti.</b></div>");
         for(const pid in msg.choices){
-          const ch = msg.choices[pid];
-          const pinfo = (msg.players && msg.players[pid]) ? msg.players[pid] : null;
-          const name = pinfo ? pinfo.name : pid;
-          lines.push(`<div>• <b>${name}</b> → Kiss: ${t[ch.kiss]}, Kill: ${t[ch.kill]}, Marry: ${t[ch.marry]}</div>`);
+          const ch = msg.choices[pid];  // [kiss, kill, marry]
+          const name = names[pid] || pid;
+          const pts = (msg.points && msg.points[pid]) || 0;
+          lines.push(`<div>• <b>${name}</b> → Kiss: ${t[ch[0]]}, Kill: ${t[ch[1]]}, Marry: ${t[ch[2]]} <span class="success">+${pts}</span></div>`);
         }
         log(lines.join(""));
         $("round").style.display="none";
       }
     }catch(e){console.error(e);}
   };
-  ws.onclose = ()=>{ setTimeout(connect, 800); };
+  ws.onclose = ()=>{ setTimeout(connect, 500 + Math.random()*1500); };
 }
 
 window.addEventListener("load", ()=>{
@@ -302,6 +470,7 @@ window.addEventListener("load", ()=>{
     ws.send(JSON.stringify({type:"join", name}));
   };
   $("hostStartBtn").onclick = ()=>{ ws.send(JSON.stringify({type:"start_round"})); };
+  $("catalog").onchange = ()=>{ ws.send(JSON.stringify({type:"set_catalog", name: $("catalog").value})); };
   connect();
 });
 </script>
@@ -309,11 +478,15 @@ window.addEventListener("load", ()=>{
 </html>
 """
 
+# Sunucuya oyun eklentisi olarak tanıt (tek başına veya hub.py ile)
+GAME = Game("kkm", INDEX_HTML, handle_message=handle_game_message, send_state=send_state, title="Kiss · Kill · Marry",
+            on_disconnect=player_disconnected)
+
 def main():
     print("🎮 Kiss · Kill · Marry - Valorant Edition")
-    print(f"📂 {len(CHARACTERS)} karakter yüklendi")
+    print(f"📂 {len(load_catalog(DEFAULT_CATALOG))} karakter yüklendi · kataloglar: {', '.join(catalog_names())}")
     
-    app = create_app(INDEX_HTML)
+    app = create_app(game=GAME)
     run_server(app, port=8080)
 
 if __name__ == "__main__":
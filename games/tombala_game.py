@@ -9,101 +9,214 @@ import sys
 # LAN server modülünü ekle
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from lan.lan_server import (
-    create_app, run_server, broadcast, build_payload, 
+    create_app, run_server, broadcast, build_payload, send, send_to, publish_state, mark_dirty, RoomLocal, Game,
+    start_task, cancel_tasks,
     players, player_by_ws, clients
 )
 
 # --- Oyun Ayarları ---
 NUMBERS_RANGE = (1, 90)  # Tombala 1-90 arası sayılar
 AUTO_DRAW_INTERVAL = 3   # Otomatik çekim (saniye, None ise manuel)
+AUTO_CLAIM = False       # True: çinko/tombala çekilişte sunucu tarafından otomatik verilir
+DRAW_SEED = None         # Sabit tohum (tekrarlanabilir oyun); None ise her oyunda rastgele
+CARDS_PER_PLAYER = 1     # Oyuncu seçmezse verilen kart sayısı
+MAX_CARDS_PER_PLAYER = 6 # Bir oyuncunun alabileceği en fazla kart
 
-# --- Oyun Durumu ---
-game_state = {
+# --- Oyun Durumu (oda başına) ---
+game_state = RoomLocal(lambda: {
     "started": False,
     "drawn_numbers": [],      # Çekilen sayılar
-    "player_cards": {},       # pid -> kartlar
+    "drawn_mask": 0,          # Çekilen sayılar bit maskesi (bit n = n çekildi)
+    "deck": [],               # Karıştırılmış, henüz çekilmemiş sayılar (sondan çekilir)
+    "seed": None,             # Oyunun tohumu (denetim için oyun sonunda açıklanır)
+    "rng": random,            # Oyunun rastgele üreteci
+    "card_counts": {},        # pid -> lobide seçilen kart sayısı
+    "cards": bytearray(),     # Tüm kartlar art arda (kart c: c*27 .. c*27+27)
+    "card_owner": [],         # kart -> pid
+    "player_cards": {},       # pid -> [kart, ...] (oyuncunun kart indeksleri)
+    "dealt": set(),           # Odada dağıtılmış kartlar (tekrar önlemek için)
+    "card_masks": [],         # kart -> satır maskeleri (3'lü)
+    "slots": {},              # sayı -> [(kart, satır)] ters indeks
+    "remaining": bytearray(), # kart*3 + satır -> satırda kalan sayı
+    "lines_done": bytearray(),# kart -> tamamlanan satır sayısı
     "cinko1_winner": None,    # İlk çinko kazananı
     "cinko2_winner": None,    # İkinci çinko kazananı
     "tombala_winner": None,   # Tombala kazananı
-}
+})
 
-def generate_tombala_card():
+# --- Kart üretimi ---
+# Kart, satır satır 27 baytlık dizi olarak tutulur (3x9 uint8, 0 = boş hücre).
+# Geçerli kart: her satırda 5 sayı, her sütunda en az 1 sayı, sütun c'deki
+# sayılar o sütunun aralığında ve yukarıdan aşağı artan sırada.
+
+CARD_ROWS, CARD_COLS = 3, 9
+COLUMN_RANGES = [range(1, 10)] + [range(col * 10, col * 10 + 10) for col in range(1, 8)] + [range(80, 91)]
+ROW_LAYOUTS = [m for m in range(1 << CARD_COLS) if bin(m).count("1") == 5]  # 126 satır düzeni
+FULL_COLS = (1 << CARD_COLS) - 1
+
+def _layout_pool():
+    """Geçerli yerleşimler: (1. satır, 2. satır) -> tüm sütunları tamamlayan 3. satırlar.
+
+    Ağırlıklar 3. satır seçenek sayısıdır; böylece her geçerli yerleşim
+    (735 210 adet) eşit olasılıkla seçilir.
+    """
+    covering = {}
+    pairs, weights, total = [], [], 0
+    for r0 in ROW_LAYOUTS:
+        for r1 in ROW_LAYOUTS:
+            need = FULL_COLS & ~(r0 | r1)
+            r2s = covering.get(need)
+            if r2s is None:
+                r2s = covering[need] = [r for r in ROW_LAYOUTS if r & need == need]
+            if r2s:
+                total += len(r2s)
+                pairs.append((r0, r1, r2s))
+                weights.append(total)
+    return pairs, weights
+
+LAYOUT_PAIRS, LAYOUT_WEIGHTS = _layout_pool()
+
+def generate_cards(count, rng=random, seen=None):
+    """`count` adet geçerli kart üret; `seen` kümesindekilerle çakışmaz (ve güncellenir)"""
+    if seen is None:
+        seen = set()
+    cards = []
+    while len(cards) < count:
+        for r0, r1, r2s in rng.choices(LAYOUT_PAIRS, cum_weights=LAYOUT_WEIGHTS, k=count - len(cards)):
+            rows = (r0, r1, rng.choice(r2s))
+            cells = bytearray(CARD_ROWS * CARD_COLS)
+            for col in range(CARD_COLS):
+                bit = 1 << col
+                used = [row for row in range(CARD_ROWS) if rows[row] & bit]
+                for row, num in zip(used, sorted(rng.sample(COLUMN_RANGES[col], len(used)))):
+                    cells[row * CARD_COLS + col] = num
+            card = bytes(cells)
+            if card not in seen:
+                seen.add(card)
+                cards.append(card)
+    return cards
+
+def card_rows(card):
+    """Kartın satırları (boş hücre None) - istemciye gönderilen biçim"""
+    return [[card[row * CARD_COLS + col] or None for col in range(CARD_COLS)] for row in range(CARD_ROWS)]
+
+def generate_tombala_card(rng=random):
     """Klasik Türk tombala kartı oluştur (3 satır, 9 sütun, satır başına 5 sayı)"""
-    card = [[None for _ in range(9)] for _ in range(3)]
-    
-    # Her sütun için sayı aralıkları
-    # Sütun 0: 1-9, Sütun 1: 10-19, ..., Sütun 8: 80-90
-    for col in range(9):
-        if col == 0:
-            pool = list(range(1, 10))
-        elif col == 8:
-            pool = list(range(80, 91))
-        else:
-            pool = list(range(col * 10, (col + 1) * 10))
-        
-        random.shuffle(pool)
-        nums = pool[:3]  # Her sütundan 3 sayı seç
-        
-        # 3 satıra yerleştir
-        for row in range(3):
-            card[row][col] = nums[row]
-    
-    # Her satırda sadece 5 sayı olmalı, 4 boş olmalı
-    for row in range(3):
-        # 9 sütundan 4 tanesini boşalt
-        cols_to_clear = random.sample(range(9), 4)
-        for col in cols_to_clear:
-            card[row][col] = None
-    
-    # Satırlardaki sayıları sırala (None'lar aynı yerde kalır)
-    for row in range(3):
-        row_nums = [(card[row][col], col) for col in range(9) if card[row][col] is not None]
-        row_nums.sort(key=lambda x: x[0])
-        
-        # Temizle ve sıralı yerleştir
-        non_none_cols = [col for col in range(9) if card[row][col] is not None]
-        for i, col in enumerate(non_none_cols):
-            card[row][col] = row_nums[i][0]
-    
-    return card
+    return card_rows(generate_cards(1, rng)[0])
 
-def check_line(card, drawn_numbers, line_idx):
+# --- Bit maskeleri ---
+# Sayılar kümesi bir tamsayının bitleriyle tutulur (bit n = n sayısı, 1-90).
+# Satır kontrolü tek bir AND/karşılaştırma olur: line & drawn == line
+
+def number_mask(numbers):
+    """Sayı listesinden bit maskesi (None/0 boş hücre)"""
+    mask = 0
+    for num in numbers:
+        if num:
+            mask |= 1 << num
+    return mask
+
+def card_masks(card):
+    """Kartın satır maskeleri"""
+    return tuple(number_mask(card[row * CARD_COLS:(row + 1) * CARD_COLS]) for row in range(CARD_ROWS))
+
+def check_line(masks, drawn_mask, line_idx):
     """Bir satırın tamamlanıp tamamlanmadığını kontrol et"""
-    line = card[line_idx]
-    for num in line:
-        if num is not None and num not in drawn_numbers:
-            return False
-    return True
+    line = masks[line_idx]
+    return line & drawn_mask == line
 
-def check_card_lines(card, drawn_numbers):
+def check_card_lines(masks, drawn_mask):
     """Kaçtane satır tamamlandı?"""
-    completed = 0
-    for i in range(3):
-        if check_line(card, drawn_numbers, i):
-            completed += 1
-    return completed
+    return sum(1 for line in masks if line & drawn_mask == line)
 
-def check_tombala(card, drawn_numbers):
+def check_tombala(masks, drawn_mask):
     """Tüm kart tamamlandı mı?"""
-    for row in card:
-        for num in row:
-            if num is not None and num not in drawn_numbers:
-                return False
-    return True
+    full = masks[0] | masks[1] | masks[2]
+    return full & drawn_mask == full
+
+def card_numbers(card):
+    """İstemciye giden sıkıştırılmış kart: satır satır 15 sayı.
+
+    Sütun sayıdan çıkar (1-9 -> 0, 10-19 -> 1, ..., 80-90 -> 8); boş
+    hücreler gönderilmez.
+    """
+    return [num for num in card if num]
+
+# --- Oda kartları ---
+# Kartlar odanın ortak dizisinde tutulur; oyuncu -> kart indeksleri
+# `player_cards`, kart -> oyuncu `card_owner` ile bulunur.
+
+def clear_cards():
+    game_state["cards"] = bytearray()
+    game_state["card_owner"] = []
+    game_state["player_cards"] = {}
+    game_state["dealt"] = set()
+    game_state["card_masks"] = []
+    game_state["slots"] = {}
+    game_state["remaining"] = bytearray()
+    game_state["lines_done"] = bytearray()
+
+def add_card(pid, card):
+    """Kartı odaya ekle ve indeksini döndür"""
+    card_id = len(game_state["card_owner"])
+    game_state["cards"] += card
+    game_state["card_owner"].append(pid)
+    game_state["player_cards"].setdefault(pid, []).append(card_id)
+    game_state["card_masks"].append(card_masks(card))
+    index_card(card_id, card)
+    return card_id
+
+# --- Artımlı kazanan tespiti ---
+# Her sayı, geçtiği (kart, satır) yuvalarına ters indeksle bağlanır. Çekilişte
+# yalnızca o sayının yuvaları güncellenir: O(sayının geçtiği kart sayısı).
+
+def index_card(card_id, card):
+    """Kartı ters indekse ekle"""
+    slots = game_state["slots"]
+    for row in range(CARD_ROWS):
+        line = [num for num in card[row * CARD_COLS:(row + 1) * CARD_COLS] if num]
+        for num in line:
+            slots.setdefault(num, []).append((card_id, row))
+        game_state["remaining"].append(len(line))
+    game_state["lines_done"].append(0)
+
+def advance_cards(number):
+    """Çekilen sayıyı kartlara işle; satır tamamlayan kartları döndür"""
+    remaining = game_state["remaining"]
+    lines_done = game_state["lines_done"]
+    completed = []
+    for card_id, row in game_state["slots"].pop(number, ()):
+        slot = card_id * CARD_ROWS + row
+        remaining[slot] -= 1
+        if not remaining[slot]:
+            lines_done[card_id] += 1
+            completed.append(card_id)
+    return completed
+
+def best_lines(pid):
+    """Oyuncunun kartları arasında en çok tamamlanan satır sayısı"""
+    masks = game_state["card_masks"]
+    drawn_mask = game_state["drawn_mask"]
+    return max((check_card_lines(masks[c], drawn_mask) for c in game_state["player_cards"].get(pid, ())), default=0)
 
 async def send_state():
     """Oyun durumunu tüm oyunculara gönder"""
     state = {
-        "players": [{"id": pid, "name": p["name"], "score": p["score"]} for pid, p in players.items()],
+        "players": [{"id": pid, "name": p["name"], "score": p["score"],
+                     "cards": game_state["card_counts"].get(pid, CARDS_PER_PLAYER)}
+                    for pid, p in players.items()],
+        "max_cards": MAX_CARDS_PER_PLAYER,
         "started": game_state["started"],
         "drawn_numbers": game_state["drawn_numbers"],
         "last_number": game_state["drawn_numbers"][-1] if game_state["drawn_numbers"] else None,
         "total_drawn": len(game_state["drawn_numbers"]),
+        "numbers_left": len(game_state["deck"]),
+        "seed": game_state["seed"] if game_state["tombala_winner"] else None,
         "cinko1_winner": game_state["cinko1_winner"],
         "cinko2_winner": game_state["cinko2_winner"],
         "tombala_winner": game_state["tombala_winner"],
     }
-    await broadcast(build_payload("state", **state))
+    await publish_state(state)
 
 async def handle_game_message(ws, data):
     """Oyundan gelen mesajları işle"""
@@ -117,6 +230,13 @@ async def handle_game_message(ws, data):
         if not game_state["started"]:
             await start_game()
     
+    elif typ == "set_cards":
+        # Lobide kart sayısı seçimi
+        count = data.get("count")
+        if not game_state["started"] and isinstance(count, int) and 1 <= count <= MAX_CARDS_PER_PLAYER:
+            game_state["card_counts"][pid] = count
+            mark_dirty()
+    
     elif typ == "draw_number":
         if game_state["started"] and not game_state["tombala_winner"]:
             await draw_number()
@@ -140,76 +260,105 @@ async def start_game():
     """Oyunu başlat ve her oyuncuya kart ver"""
     game_state["started"] = True
     game_state["drawn_numbers"] = []
-    game_state["player_cards"] = {}
+    game_state["drawn_mask"] = 0
+    clear_cards()
     game_state["cinko1_winner"] = None
     game_state["cinko2_winner"] = None
     game_state["tombala_winner"] = None
     
-    # Her oyuncuya kart oluştur
-    for pid in players:
-        card = generate_tombala_card()
-        game_state["player_cards"][pid] = card
+    # Deste bir kez karıştırılır; aynı tohum aynı kartları ve çekiliş sırasını verir
+    seed = DRAW_SEED if DRAW_SEED is not None else random.randrange(2 ** 32)
+    rng = random.Random(seed)
+    deck = list(range(NUMBERS_RANGE[0], NUMBERS_RANGE[1] + 1))
+    rng.shuffle(deck)
+    game_state["seed"] = seed
+    game_state["rng"] = rng
+    game_state["deck"] = deck
+    
+    # Her oyuncuya kartlarını oluştur (tek seferde, odada tekrarsız)
+    counts = {pid: game_state["card_counts"].get(pid, CARDS_PER_PLAYER) for pid in players}
+    cards = iter(generate_cards(sum(counts.values()), rng, game_state["dealt"]))
+    for pid, count in counts.items():
+        own = [next(cards) for _ in range(count)]
+        for card in own:
+            add_card(pid, card)
         
-        # Oyuncuya kartını gönder
-        ws = [w for w, p in player_by_ws.items() if p == pid][0] if pid in player_by_ws.values() else None
-        if ws:
-            try:
-                await ws.send_str(build_payload("your_card", card=card))
-            except:
-                pass
+        # Oyuncuya kartlarını gönder
+        send_to(pid, build_payload("your_card", cards=[card_numbers(card) for card in own]))
     
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("game_started"))
     
     # Otomatik çekim başlat
     if AUTO_DRAW_INTERVAL:
-        asyncio.create_task(auto_draw_loop())
+        start_task("auto_draw", auto_draw_loop)
 
 async def auto_draw_loop():
     """Otomatik sayı çekme döngüsü"""
     while game_state["started"] and not game_state["tombala_winner"]:
         await asyncio.sleep(AUTO_DRAW_INTERVAL)
-        if len(game_state["drawn_numbers"]) < 90:
+        if game_state["deck"]:
             await draw_number()
         else:
             break
 
 async def draw_number():
     """Yeni bir sayı çek"""
-    available = [n for n in range(NUMBERS_RANGE[0], NUMBERS_RANGE[1] + 1) 
-                 if n not in game_state["drawn_numbers"]]
-    
-    if not available:
+    deck = game_state["deck"]
+    if not deck:
         await broadcast(build_payload("no_more_numbers"))
         return
     
-    number = random.choice(available)
+    number = deck.pop()
     game_state["drawn_numbers"].append(number)
+    game_state["drawn_mask"] |= 1 << number
     
     await broadcast(build_payload("number_drawn", number=number, total=len(game_state["drawn_numbers"])))
-    await send_state()
+    completed = advance_cards(number)
+    if AUTO_CLAIM and completed:
+        await award_completed(completed)
+    mark_dirty()
+
+async def award_completed(card_ids):
+    """Bu çekilişte satır tamamlayanlara boştaki ödülleri ver (ilk gelen alır)"""
+    lines_done = game_state["lines_done"]
+    for card_id in card_ids:
+        pid = game_state["card_owner"][card_id]
+        if pid not in players:
+            continue
+        lines = lines_done[card_id]
+        if lines >= 1 and not game_state["cinko1_winner"]:
+            await award_cinko(pid, 1)
+        if lines >= 2 and not game_state["cinko2_winner"]:
+            await award_cinko(pid, 2)
+        if lines == 3 and not game_state["tombala_winner"]:
+            await award_tombala(pid)
+
+async def award_cinko(pid, cinko_level):
+    """Çinko ödülünü ver"""
+    game_state[f"cinko{cinko_level}_winner"] = pid
+    players[pid]["score"] += 10 if cinko_level == 1 else 20
+    winner_name = players[pid]["name"]
+    await broadcast(build_payload(f"cinko{cinko_level}_won", winner=winner_name, pid=pid))
+    mark_dirty()
+
+async def award_tombala(pid):
+    """Tombala ödülünü ver"""
+    game_state["tombala_winner"] = pid
+    players[pid]["score"] += 50
+    winner_name = players[pid]["name"]
+    await broadcast(build_payload("tombala_won", winner=winner_name, pid=pid))
+    mark_dirty()
 
 async def check_cinko_claim(pid, cinko_level):
     """Çinko iddiasını kontrol et"""
-    card = game_state["player_cards"].get(pid)
-    if not card:
+    if pid not in game_state["player_cards"]:
         return
     
-    completed_lines = check_card_lines(card, game_state["drawn_numbers"])
-    
-    if cinko_level == 1 and completed_lines >= 1:
-        game_state["cinko1_winner"] = pid
-        players[pid]["score"] += 10
-        winner_name = players[pid]["name"]
-        await broadcast(build_payload("cinko1_won", winner=winner_name, pid=pid))
-        await send_state()
+    completed_lines = best_lines(pid)
     
-    elif cinko_level == 2 and completed_lines >= 2:
-        game_state["cinko2_winner"] = pid
-        players[pid]["score"] += 20
-        winner_name = players[pid]["name"]
-        await broadcast(build_payload("cinko2_won", winner=winner_name, pid=pid))
-        await send_state()
+    if completed_lines >= cinko_level:
+        await award_cinko(pid, cinko_level)
     
     else:
         # Yanlış iddia
@@ -217,29 +366,41 @@ async def check_cinko_claim(pid, cinko_level):
 
 async def check_tombala_claim(pid):
     """Tombala iddiasını kontrol et"""
-    card = game_state["player_cards"].get(pid)
-    if not card:
+    card_ids = game_state["player_cards"].get(pid)
+    if not card_ids:
         return
     
-    if check_tombala(card, game_state["drawn_numbers"]):
-        game_state["tombala_winner"] = pid
-        players[pid]["score"] += 50
-        winner_name = players[pid]["name"]
-        await broadcast(build_payload("tombala_won", winner=winner_name, pid=pid))
-        await send_state()
+    masks = game_state["card_masks"]
+    if any(check_tombala(masks[c], game_state["drawn_mask"]) for c in card_ids):
+        await award_tombala(pid)
     else:
         # Yanlış iddia
         await broadcast(build_payload("wrong_claim", pid=pid, claim_type="tombala"))
 
+async def resume_player(ws, pid):
+    """Yeniden bağlanan oyuncuya kartlarını ve oyun ekranını geri ver"""
+    card_ids = game_state["player_cards"].get(pid)
+    if card_ids:
+        cards = game_state["cards"]
+        own = [cards[c * 27:c * 27 + 27] for c in card_ids]
+        send(ws, build_payload("your_card", cards=[card_numbers(card) for card in own]))
+    # Oyun bittiyse çekiliş/iddia düğmeleri ve geri sayım geri gelmesin
+    if game_state["started"] and not game_state["tombala_winner"]:
+        send(ws, build_payload("game_started"))
+
 async def reset_game():
     """Oyunu sıfırla"""
+    cancel_tasks()
     game_state["started"] = False
     game_state["drawn_numbers"] = []
-    game_state["player_cards"] = {}
+    game_state["drawn_mask"] = 0
+    game_state["deck"] = []
+    game_state["seed"] = None
+    clear_cards()
     game_state["cinko1_winner"] = None
     game_state["cinko2_winner"] = None
     game_state["tombala_winner"] = None
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("game_reset"))
 
 # --- HTML Arayüzü ---
@@ -443,6 +604,7 @@ INDEX_HTML = """
             max-width: 600px;
             margin: 0 auto;
         }
+        .tombala-card + .tombala-card { margin-top: 24px; }
         .card-cell {
             aspect-ratio: 1;
             display: flex;
@@ -668,6 +830,21 @@ INDEX_HTML = """
             align-items: center;
             gap: 10px;
         }
+        .card-count {
+            margin-bottom: 15px;
+            display: flex;
+            align-items: center;
+            gap: 10px;
+        }
+        .card-count select {
+            padding: 8px 12px;
+            border-radius: 10px;
+            border: 1px solid rgba(255, 255, 255, 0.3);
+            background: rgba(255, 255, 255, 0.15);
+            color: white;
+            font-size: 1em;
+        }
+        .card-count option { color: #333; }
         .players-list {
             background: rgba(255, 255, 255, 0.08);
             backdrop-filter: blur(10px);
@@ -825,6 +1002,10 @@ INDEX_HTML = """
                     <span>🌐</span>
                     <span>LAN Lobi - Oyuncular Bağlanıyor...</span>
                 </div>
+                <div class="card-count">
+                    <span>🎴 Kart sayısı</span>
+                    <select id="cardCount" onchange="setCards()"></select>
+                </div>
                 <div id="lobbyPlayers"></div>
             </div>
             
@@ -846,8 +1027,8 @@ INDEX_HTML = """
                 <!-- Left: My Card -->
                 <div class="layout-left">
                     <div class="card-container" id="cardContainer" style="display:none;">
-                        <div class="card-title">🎴 Kartınız</div>
-                        <div class="tombala-card" id="myCard"></div>
+                        <div class="card-title" id="cardTitle">🎴 Kartınız</div>
+                        <div id="myCards"></div>
                     </div>
                 </div>
                 
@@ -880,37 +1061,49 @@ INDEX_HTML = """
     <div class="winner-announcement" id="winnerMsg"></div>
     <div id="confettiContainer"></div>
     
+    <script src="lan_state.js"></script>
     <script>
         let ws = null;
         let myPid = null;
-        let myCard = null;
+        let myCards = [];
         let drawnNumbers = [];
         let autoDrawTimer = null;
         let countdownInterval = null;
         let isHost = false;
         
-        function joinGame() {
-            const name = document.getElementById('playerName').value.trim() || 'Guest';
-            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
-            ws = new WebSocket(`${protocol}//${window.location.host}/ws`);
+        function connect(onopen) {
+            const sock = ws = LanWire.open();
             
-            ws.onopen = () => {
-                ws.send(JSON.stringify({type: 'join', name: name}));
-            };
+            sock.onopen = () => onopen(sock);
             
-            ws.onmessage = (event) => {
-                const data = JSON.parse(event.data);
+            sock.onmessage = (event) => {
+                const data = LanWire.decode(event.data);
                 handleMessage(data);
             };
             
-            ws.onclose = () => {
+            sock.onclose = () => {
                 console.log('Bağlantı kesildi');
+                // Oturum varsa aynı oyuncu olarak geri dön (dağınık bekleme: herkes aynı anda bağlanmasın)
+                if (sock === ws && LanSession.token()) {
+                    setTimeout(() => connect(s => LanSession.resume(s)), 500 + Math.random() * 1500);
+                }
             };
         }
         
+        function joinGame() {
+            const name = document.getElementById('playerName').value.trim() || 'Guest';
+            connect(sock => sock.send(JSON.stringify({type: 'join', name: name})));
+        }
+        
+        // Sayfa yenilendiyse oturuma kaldığı yerden devam et
+        if (LanSession.token()) {
+            connect(sock => LanSession.resume(sock));
+        }
+        
         function handleMessage(data) {
             if (data.type === 'joined') {
                 myPid = data.pid;
+                LanSession.save(data);
                 document.getElementById('join-screen').style.display = 'none';
                 document.getElementById('game-screen').style.display = 'block';
                 initNumbersGrid();
@@ -920,12 +1113,21 @@ INDEX_HTML = """
                     isHost = true;
                 }
             }
-            else if (data.type === 'state') {
-                updateState(data);
-                updateLobby(data);
+            else if (data.type === 'resume_failed') {
+                // Oturum süresi dolmuş: yeniden katılmak gerekir
+                LanSession.clear();
+                document.getElementById('join-screen').style.display = 'block';
+                document.getElementById('game-screen').style.display = 'none';
+            }
+            else if (data.type === 'state' || data.type === 'state_patch') {
+                const state = LanState.apply(data, ws);
+                if (state) {
+                    updateState(state);
+                    updateLobby(state);
+                }
             }
             else if (data.type === 'your_card') {
-                myCard = data.card;
+                myCards = data.cards.map(expandCard);
                 displayCard();
                 document.getElementById('cardContainer').style.display = 'block';
                 document.getElementById('lobbyInfo').style.display = 'none';
@@ -1034,7 +1236,7 @@ INDEX_HTML = """
                 tombalaEl.innerHTML = `<span class="trophy-icon">🎊</span> <span>-</span>`;
             }
             
-            drawnNumbers = data.drawn_numbers;
+            drawnNumbers = data.drawn_numbers.slice();
             updateNumbersGrid();
             
             const playersList = document.getElementById('playersList');
@@ -1060,6 +1262,16 @@ INDEX_HTML = """
             if (!data.started && data.players && data.players.length > 0) {
                 const lobbyInfo = document.getElementById('lobbyInfo');
                 const lobbyPlayers = document.getElementById('lobbyPlayers');
+                const cardCount = document.getElementById('cardCount');
+                const me = data.players.find(p => p.id === myPid);
+                
+                if (cardCount.options.length !== data.max_cards) {
+                    cardCount.innerHTML = '';
+                    for (let i = 1; i <= data.max_cards; i++) {
+                        cardCount.add(new Option(i, i));
+                    }
+                }
+                if (me) cardCount.value = me.cards;
                 
                 lobbyInfo.style.display = 'block';
                 lobbyPlayers.innerHTML = data.players.map((p, idx) => `
@@ -1069,7 +1281,7 @@ INDEX_HTML = """
                             <strong>${p.name}</strong>
                             ${p.id === myPid ? '(Sen)' : ''}
                         </span>
-                        <span>Hazır ✓</span>
+                        <span>🎴 ${p.cards} · Hazır ✓</span>
                     </div>
                 `).join('');
             }
@@ -1077,6 +1289,8 @@ INDEX_HTML = """
         
         function initNumbersGrid() {
             const grid = document.getElementById('numbersGrid');
+            // Yeniden bağlanınca "joined" tekrar gelir; toplar bir kez oluşturulur
+            if (grid.children.length) return;
             for (let i = 1; i <= 90; i++) {
                 const ball = document.createElement('div');
                 ball.className = 'number-ball';
@@ -1100,28 +1314,53 @@ INDEX_HTML = """
             });
         }
         
+        // Sunucu kartı satır satır 15 sayı olarak gönderir; sütun sayıdan çıkar
+        function expandCard(nums) {
+            const card = [];
+            for (let row = 0; row < 3; row++) {
+                const line = new Array(9).fill(null);
+                nums.slice(row * 5, row * 5 + 5).forEach(num => {
+                    line[num === 90 ? 8 : Math.floor(num / 10)] = num;
+                });
+                card.push(line);
+            }
+            return card;
+        }
+        
+        function setCards() {
+            const count = parseInt(document.getElementById('cardCount').value, 10);
+            ws.send(JSON.stringify({type: 'set_cards', count: count}));
+        }
+        
         function displayCard() {
-            if (!myCard) return;
-            const cardDiv = document.getElementById('myCard');
-            cardDiv.innerHTML = '';
+            if (!myCards.length) return;
+            const container = document.getElementById('myCards');
+            container.innerHTML = '';
+            document.getElementById('cardTitle').textContent =
+                myCards.length > 1 ? `🎴 Kartlarınız (${myCards.length})` : '🎴 Kartınız';
             
-            for (let row = 0; row < 3; row++) {
-                for (let col = 0; col < 9; col++) {
-                    const cell = document.createElement('div');
-                    const num = myCard[row][col];
-                    
-                    if (num === null) {
-                        cell.className = 'card-cell empty';
-                    } else {
-                        cell.className = 'card-cell';
-                        cell.textContent = num;
-                        if (drawnNumbers.includes(num)) {
-                            cell.classList.add('drawn');
+            myCards.forEach(card => {
+                const cardDiv = document.createElement('div');
+                cardDiv.className = 'tombala-card';
+                for (let row = 0; row < 3; row++) {
+                    for (let col = 0; col < 9; col++) {
+                        const cell = document.createElement('div');
+                        const num = card[row][col];
+                        
+                        if (num === null) {
+                            cell.className = 'card-cell empty';
+                        } else {
+                            cell.className = 'card-cell';
+                            cell.textContent = num;
+                            if (drawnNumbers.includes(num)) {
+                                cell.classList.add('drawn');
+                            }
                         }
+                        cardDiv.appendChild(cell);
                     }
-                    cardDiv.appendChild(cell);
                 }
-            }
+                container.appendChild(cardDiv);
+            });
         }
         
         function showWinner(msg) {
@@ -1205,15 +1444,15 @@ INDEX_HTML = """
 </html>
 """
 
-# Sunucu mesaj yöneticisini override et
-import lan.lan_server as server
-server.handle_game_message = handle_game_message
-server.send_state = send_state
+
+# Sunucuya oyun eklentisi olarak tanıt (tek başına veya hub.py ile)
+GAME = Game("tombala", INDEX_HTML, handle_message=handle_game_message, send_state=send_state, title="Tombala",
+            on_resume=resume_player)
 
 def main():
     print("🎲 Tombala (Bingo) - LAN Edition")
     print("=" * 50)
-    app = create_app(INDEX_HTML)
+    app = create_app(game=GAME)
     run_server(app, port=8080)
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
 # trustnoone_game.py
 # Trust No One - Social Deduction Game
 
-import asyncio
 import os
 import random
 import sys
@@ -9,8 +8,9 @@ import sys
 # LAN server modülünü ekle
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from lan.lan_server import (
-    create_app, run_server, broadcast, build_payload, 
-    players, player_by_ws, clients
+    create_app, run_server, broadcast, build_payload, send, send_to, publish_state, mark_dirty, RoomLocal, Game,
+    set_timer, cancel_timer, timer_deadline, cancel_tasks,
+    players, player_by_ws, ws_by_player, clients
 )
 
 # --- Oyun Ayarları ---
@@ -34,8 +34,8 @@ TASK_CARDS = [
     "System Diagnostics"
 ]
 
-# --- Oyun Durumu ---
-game_state = {
+# --- Oyun Durumu (oda başına) ---
+game_state = RoomLocal(lambda: {
     "started": False,
     "phase": "lobby",
     "roles": {},
@@ -44,11 +44,12 @@ game_state = {
     "round": 0,
     "current_task": None,
     "choices": {},
-    "votes": {},
+    "votes": {},              # pid -> hedef pid veya "skip"
+    "vote_counts": {},        # hedef pid -> oy sayısı (artımlı, "skip" sayılmaz)
     "saboteur": None,
-    "timer": 0,
+    "deadline": None,         # Aşamanın bitiş zamanı (epoch ms); istemci yerelde geri sayar
     "eliminated": []
-}
+})
 
 async def send_state():
     """Oyun durumunu tüm oyunculara gönder"""
@@ -60,11 +61,11 @@ async def send_state():
         "progress": game_state["progress"],
         "round": game_state["round"],
         "current_task": game_state["current_task"],
-        "timer": game_state["timer"],
+        "deadline": game_state["deadline"],
         "alive_count": len(game_state["alive"]),
         "eliminated": game_state["eliminated"]
     }
-    await broadcast(build_payload("state", **state))
+    await publish_state(state)
 
 async def handle_game_message(ws, data):
     """Oyundan gelen mesajları işle"""
@@ -76,8 +77,8 @@ async def handle_game_message(ws, data):
             return
         name = data.get("name", "Guest")
         players[pid]["name"] = name
-        await ws.send_str(build_payload("joined", pid=pid))
-        await send_state()
+        send(ws, build_payload("joined", pid=pid))
+        mark_dirty()
         return
     
     pid = player_by_ws.get(ws)
@@ -89,23 +90,65 @@ async def handle_game_message(ws, data):
             await start_game()
     
     elif typ == "submit_action":
-        if game_state["phase"] == "task" and pid in game_state["alive"]:
+        if phase_open("task") and pid in game_state["alive"]:
             action = data.get("action")
             if action in ["DO", "SKIP", "SABOTAGE"]:
                 if action == "SABOTAGE" and game_state["roles"].get(pid) != "saboteur":
                     return
                 game_state["choices"][pid] = action
-                await send_state()
+                mark_dirty()
+                # Hayatta olan herkes seçtiyse süreyi bekleme
+                if everyone_acted(game_state["choices"]):
+                    await finish_phase(end_task_round)
     
     elif typ == "vote":
-        if game_state["phase"] == "meeting" and pid in game_state["alive"]:
+        if phase_open("meeting") and pid in game_state["alive"]:
             target = data.get("target")
-            game_state["votes"][pid] = target
-            await send_state()
+            if target != "skip" and target not in game_state["alive"]:
+                return
+            cast_vote(pid, target)
+            mark_dirty()
+            if everyone_acted(game_state["votes"]):
+                await finish_phase(end_meeting)
     
     elif typ == "reset_game":
         await reset_game()
 
+def phase_open(phase):
+    """Aşama sürüyor mu (süresi dolunca veya erken bitince kapanır)"""
+    # "phase" yalnızca açık aşamanın bitiş zamanıdır; aşamalar arası beklemeler "next" ile kurulur.
+    # Zamanlayıcı tetiklenince kayıttan düşer; bitiş görevi henüz çalışmamış olsa da aşama kapalıdır
+    return game_state["phase"] == phase and timer_deadline("phase") is not None
+
+async def finish_phase(end):
+    """Aşamayı süresini beklemeden bitir (zamanlayıcı zaten tetiklendiyse bitirmeyi ona bırak)"""
+    if cancel_timer("phase"):
+        await end()
+
+def everyone_acted(done):
+    """Bağlı ve hayatta olan herkes seçti mi (bağlantısı kopanlar beklenmez)"""
+    waiting = [pid for pid in game_state["alive"] if pid in ws_by_player]
+    return bool(waiting) and all(pid in done for pid in waiting)
+
+async def player_disconnected(pid):
+    # Kopan oyuncu beklenen son kişiyse aşamayı bitir
+    if phase_open("task") and everyone_acted(game_state["choices"]):
+        await finish_phase(end_task_round)
+    elif phase_open("meeting") and everyone_acted(game_state["votes"]):
+        await finish_phase(end_meeting)
+
+def cast_vote(pid, target):
+    """Oyu kaydet; değiştirilen oy eski hedeften düşülür"""
+    counts = game_state["vote_counts"]
+    old = game_state["votes"].get(pid)
+    if old is not None and old != "skip":
+        counts[old] -= 1
+        if not counts[old]:
+            del counts[old]
+    game_state["votes"][pid] = target
+    if target != "skip":
+        counts[target] = counts.get(target, 0) + 1
+
 async def start_game():
     """Oyunu başlat"""
     if len(players) < MIN_PLAYERS:
@@ -126,18 +169,11 @@ async def start_game():
     for pid in player_ids:
         role = "saboteur" if pid == saboteur_id else "crew"
         game_state["roles"][pid] = role
-        
-        ws = [w for w, p in player_by_ws.items() if p == pid][0] if pid in player_by_ws.values() else None
-        if ws:
-            try:
-                await ws.send_str(build_payload("your_role", role=role, is_saboteur=(role == "saboteur")))
-            except:
-                pass
+        send_to(pid, build_payload("your_role", role=role, is_saboteur=(role == "saboteur")))
     
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("game_started"))
-    await asyncio.sleep(2)
-    await start_task_round()
+    set_timer("next", 2, start_task_round)
 
 async def start_task_round():
     """Yeni görev turu başlat"""
@@ -154,20 +190,15 @@ async def start_task_round():
     game_state["phase"] = "task"
     game_state["current_task"] = random.choice(TASK_CARDS)
     game_state["choices"] = {}
-    game_state["timer"] = TASK_TIME
-    
-    await send_state()
-    await broadcast(build_payload("task_started", task=game_state["current_task"], time=TASK_TIME))
+    game_state["deadline"] = set_timer("phase", TASK_TIME, end_task_round)
     
-    for i in range(TASK_TIME, 0, -1):
-        game_state["timer"] = i
-        await send_state()
-        await asyncio.sleep(1)
-    
-    await end_task_round()
+    mark_dirty()
+    await broadcast(build_payload("task_started", task=game_state["current_task"], time=TASK_TIME,
+                                  deadline=game_state["deadline"]))
 
 async def end_task_round():
     """Görev turunu bitir"""
+    game_state["deadline"] = None
     sabotaged = False
     task_done_count = 0
     
@@ -187,39 +218,29 @@ async def end_task_round():
     
     game_state["progress"] = max(0, min(WIN_PROGRESS, game_state["progress"]))
     
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("task_result", result=result, progress=game_state["progress"], sabotaged=sabotaged))
     
     if game_state["progress"] >= WIN_PROGRESS:
         await end_game("crew")
         return
     
-    await asyncio.sleep(3)
-    await start_meeting()
+    set_timer("next", 3, start_meeting)
 
 async def start_meeting():
     """Oylama toplantısı başlat"""
     game_state["phase"] = "meeting"
     game_state["votes"] = {}
-    game_state["timer"] = VOTE_TIME
-    
-    await send_state()
-    await broadcast(build_payload("meeting_started", time=VOTE_TIME))
+    game_state["vote_counts"] = {}
+    game_state["deadline"] = set_timer("phase", VOTE_TIME, end_meeting)
     
-    for i in range(VOTE_TIME, 0, -1):
-        game_state["timer"] = i
-        await send_state()
-        await asyncio.sleep(1)
-    
-    await end_meeting()
+    mark_dirty()
+    await broadcast(build_payload("meeting_started", time=VOTE_TIME, deadline=game_state["deadline"]))
 
 async def end_meeting():
     """Oylamayı bitir ve sonucu değerlendir"""
-    vote_counts = {}
-    for pid in game_state["alive"]:
-        target = game_state["votes"].get(pid, "skip")
-        if target != "skip":
-            vote_counts[target] = vote_counts.get(target, 0) + 1
+    game_state["deadline"] = None
+    vote_counts = game_state["vote_counts"]
     
     if vote_counts:
         max_votes = max(vote_counts.values())
@@ -236,24 +257,22 @@ async def end_meeting():
             await broadcast(build_payload("player_eliminated", pid=eliminated_pid, name=eliminated_name, was_saboteur=was_saboteur))
             
             if was_saboteur:
-                await asyncio.sleep(3)
-                await end_game("crew")
+                mark_dirty()
+                set_timer("next", 3, end_game, "crew")
                 return
         else:
             await broadcast(build_payload("vote_tie"))
     else:
         await broadcast(build_payload("no_elimination"))
     
-    await send_state()
+    mark_dirty()
     
     crew_count = sum(1 for pid in game_state["alive"] if game_state["roles"].get(pid) == "crew")
     if crew_count <= 1:
-        await asyncio.sleep(3)
-        await end_game("saboteur")
+        set_timer("next", 3, end_game, "saboteur")
         return
     
-    await asyncio.sleep(3)
-    await start_task_round()
+    set_timer("next", 3, start_task_round)
 
 async def end_game(winner):
     """Oyunu bitir"""
@@ -268,14 +287,24 @@ async def end_game(winner):
         if saboteur_pid:
             players[saboteur_pid]["score"] += 200
     
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("game_ended", winner=winner, saboteur_pid=game_state["saboteur"], 
                                   saboteur_name=players.get(game_state["saboteur"], {}).get("name", "Unknown")))
 
+async def resume_player(ws, pid):
+    """Yeniden bağlanan oyuncuya rolünü ve oyun ekranını geri ver"""
+    role = game_state["roles"].get(pid)
+    if role:
+        send(ws, build_payload("your_role", role=role, is_saboteur=(role == "saboteur")))
+    if game_state["started"]:
+        send(ws, build_payload("game_started"))
+
 async def reset_game():
     """Oyunu sıfırla"""
+    cancel_tasks()
     game_state["started"] = False
     game_state["phase"] = "lobby"
+    game_state["deadline"] = None
     game_state["roles"] = {}
     game_state["alive"] = set()
     game_state["progress"] = 0
@@ -283,9 +312,10 @@ async def reset_game():
     game_state["current_task"] = None
     game_state["choices"] = {}
     game_state["votes"] = {}
+    game_state["vote_counts"] = {}
     game_state["saboteur"] = None
     game_state["eliminated"] = []
-    await send_state()
+    mark_dirty()
     await broadcast(build_payload("game_reset"))
 
 # --- HTML Arayüzü ---
@@ -355,11 +385,14 @@ button:active { transform: translateY(0); }
 </div>
 </div>
 <div class="announcement" id="announcement"></div>
+<script src="lan_state.js"></script>
 <script>
 var ws=null;var myPid=null;var myRole=null;var gameState={};
-function joinGame(){var name=document.getElementById('playerName').value.trim()||'Guest';var protocol=window.location.protocol==='https:'?'wss:':'ws:';ws=new WebSocket(protocol+'//'+window.location.host+'/ws');ws.onopen=function(){ws.send(JSON.stringify({type:'join',name:name}));};ws.onmessage=function(event){var data=JSON.parse(event.data);handleMessage(data);};}
-function handleMessage(data){if(data.type==='joined'){myPid=data.pid;document.getElementById('join-screen').style.display='none';document.getElementById('game-screen').style.display='block';document.getElementById('lobbyPhase').classList.remove('hidden');}else if(data.type==='state'){gameState=data;updateUI();updateLobbyButton();}else if(data.type==='your_role'){myRole=data.role;showRole(data.role,data.is_saboteur);}else if(data.type==='game_started'){document.getElementById('lobbyPhase').classList.add('hidden');}else if(data.type==='task_started'){document.getElementById('taskCard').textContent=data.task;document.getElementById('yourChoice').textContent='';}else if(data.type==='task_result'){var msg=data.sabotaged?'SABOTAJ! Gorev basarisiz!':'Gorev tamamlandi!';showAnnouncement(msg,2000);}else if(data.type==='meeting_started'){updateVoteButtons();document.getElementById('yourVote').textContent='';}else if(data.type==='player_eliminated'){var msg=data.name+' elendi!\n'+(data.was_saboteur?'SABOTEUR BULUNDU!':'Masum birini attiniz...');showAnnouncement(msg,3000);}else if(data.type==='vote_tie'){showAnnouncement('Esitlik! Kimse elenmedi.',2000);}else if(data.type==='no_elimination'){showAnnouncement('Skip kazandi, kimse elenmedi.',2000);}else if(data.type==='game_ended'){var winnerText=data.winner==='crew'?'CREW KAZANDI!':'SABOTEUR KAZANDI!';showAnnouncement(winnerText+'\n\nSaboteur: '+data.saboteur_name,5000);}else if(data.type==='game_reset'){location.reload();}}
-function updateUI(){var progress=Math.max(0,Math.min(100,gameState.progress));document.getElementById('progressBar').style.width=progress+'%';document.getElementById('progressText').textContent=progress+'%';document.getElementById('roundNumber').textContent=gameState.round;if(gameState.timer>0){document.getElementById('timerDisplay').textContent=gameState.timer;document.getElementById('timerDisplay').classList.remove('hidden');}else{document.getElementById('timerDisplay').classList.add('hidden');}if(gameState.phase==='task'){document.getElementById('taskPhase').classList.remove('hidden');}else{document.getElementById('taskPhase').classList.add('hidden');}if(gameState.phase==='meeting'){document.getElementById('meetingPhase').classList.remove('hidden');}else{document.getElementById('meetingPhase').classList.add('hidden');}updatePlayersList();document.getElementById('aliveCount').textContent=gameState.alive_count||0;}
+function connect(onopen){var sock=ws=LanWire.open();sock.onopen=function(){onopen(sock);};sock.onmessage=function(event){var data=LanWire.decode(event.data);handleMessage(data);};sock.onclose=function(){if(sock===ws&&LanSession.token()){setTimeout(function(){connect(function(s){LanSession.resume(s);});},500+Math.random()*1500);}};}
+function joinGame(){var name=document.getElementById('playerName').value.trim()||'Guest';connect(function(sock){sock.send(JSON.stringify({type:'join',name:name}));});}
+function handleMessage(data){if(data.type==='joined'){myPid=data.pid;LanSession.save(data);document.getElementById('join-screen').style.display='none';document.getElementById('game-screen').style.display='block';document.getElementById('lobbyPhase').classList.remove('hidden');}else if(data.type==='resume_failed'){LanSession.clear();document.getElementById('join-screen').style.display='block';document.getElementById('game-screen').style.display='none';}else if(data.type==='state'||data.type==='state_patch'){var st=LanState.apply(data,ws);if(st){gameState=st;updateUI();updateLobbyButton();}}else if(data.type==='your_role'){myRole=data.role;showRole(data.role,data.is_saboteur);}else if(data.type==='game_started'){document.getElementById('lobbyPhase').classList.add('hidden');}else if(data.type==='task_started'){document.getElementById('taskCard').textContent=data.task;document.getElementById('yourChoice').textContent='';}else if(data.type==='task_result'){var msg=data.sabotaged?'SABOTAJ! Gorev basarisiz!':'Gorev tamamlandi!';showAnnouncement(msg,2000);}else if(data.type==='meeting_started'){updateVoteButtons();document.getElementById('yourVote').textContent='';}else if(data.type==='player_eliminated'){var msg=data.name+' elendi!\n'+(data.was_saboteur?'SABOTEUR BULUNDU!':'Masum birini attiniz...');showAnnouncement(msg,3000);}else if(data.type==='vote_tie'){showAnnouncement('Esitlik! Kimse elenmedi.',2000);}else if(data.type==='no_elimination'){showAnnouncement('Skip kazandi, kimse elenmedi.',2000);}else if(data.type==='game_ended'){var winnerText=data.winner==='crew'?'CREW KAZANDI!':'SABOTEUR KAZANDI!';showAnnouncement(winnerText+'\n\nSaboteur: '+data.saboteur_name,5000);}else if(data.type==='game_reset'){location.reload();}}
+function updateUI(){var progress=Math.max(0,Math.min(100,gameState.progress));document.getElementById('progressBar').style.width=progress+'%';document.getElementById('progressText').textContent=progress+'%';document.getElementById('roundNumber').textContent=gameState.round;updateTimer();if(gameState.phase==='task'){document.getElementById('taskPhase').classList.remove('hidden');if(gameState.current_task){document.getElementById('taskCard').textContent=gameState.current_task;}}else{document.getElementById('taskPhase').classList.add('hidden');}if(gameState.phase==='meeting'){document.getElementById('meetingPhase').classList.remove('hidden');updateVoteButtons();}else{document.getElementById('meetingPhase').classList.add('hidden');}updatePlayersList();document.getElementById('aliveCount').textContent=gameState.alive_count||0;}
+function updateTimer(){var left=LanClock.remaining(gameState.deadline);var el=document.getElementById('timerDisplay');if(left>0){el.textContent=left;el.classList.remove('hidden');}else{el.classList.add('hidden');}}
 function showRole(role,isSaboteur){var roleCard=document.getElementById('roleCard');var roleBadge=document.getElementById('roleBadge');var roleDesc=document.getElementById('roleDesc');roleCard.classList.remove('hidden');if(isSaboteur){roleBadge.className='role-badge role-saboteur';roleBadge.textContent='SABOTEUR';roleDesc.textContent='Gorevleri sabote et ve yakalanma!';document.getElementById('sabotageBtn').style.display='inline-block';}else{roleBadge.className='role-badge role-crew';roleBadge.textContent='CREW';roleDesc.textContent='Gorevleri tamamla ve saboteur bul!';}}
 function updatePlayersList(){var list=document.getElementById('playersList');if(!gameState.players)return;var html='';for(var i=0;i<gameState.players.length;i++){var p=gameState.players[i];var statusClass=p.alive?'alive':'dead';var eliminatedBadge=!p.alive?'<div style="position:absolute;top:8px;left:8px;background:rgba(239,68,68,.9);color:#fff;font-size:0.65rem;padding:3px 8px;border-radius:6px;font-weight:700;">ELENDİ</div>':'';html+='<div class="player-card '+statusClass+'">';html+=eliminatedBadge;html+='<div style="font-weight: bold; font-size: 1.1em; margin-bottom: 6px;">'+p.name+'</div>';html+='<div style="opacity: 0.6; font-size: 0.9em;">Skor: '+p.score+'</div>';html+='</div>';}list.innerHTML=html;}
 function updateVoteButtons(){var container=document.getElementById('voteButtons');if(!gameState.players)return;var html='';for(var i=0;i<gameState.players.length;i++){var p=gameState.players[i];if(p.alive&&p.id!==myPid){html+='<button class="btn-vote" data-id="'+p.id+'">'+p.name+'</button>';}}html+='<button class="btn-skip" data-id="skip">SKIP</button>';container.innerHTML=html;var btns=container.getElementsByTagName('button');for(var j=0;j<btns.length;j++){btns[j].onclick=function(){vote(this.getAttribute('data-id'));}}}
@@ -375,20 +408,22 @@ document.getElementById('doBtn').onclick=function(){submitAction('DO');};
 document.getElementById('skipBtn').onclick=function(){submitAction('SKIP');};
 document.getElementById('sabotageBtn').onclick=function(){submitAction('SABOTAGE');};
 document.getElementById('resetBtn').onclick=resetGame;
+setInterval(updateTimer,250);
+if(LanSession.token()){connect(function(s){LanSession.resume(s);});}
 </script>
 </body>
 </html>
 """
 
-# Sunucu mesaj yöneticisini override et
-import lan.lan_server as server
-server.handle_game_message = handle_game_message
-server.send_state = send_state
+
+# Sunucuya oyun eklentisi olarak tanıt (tek başına veya hub.py ile)
+GAME = Game("trustnoone", INDEX_HTML, handle_message=handle_game_message, send_state=send_state, title="Trust No One",
+            on_resume=resume_player, on_disconnect=player_disconnected)
 
 def main():
     print("Trust No One - LAN Edition")
     print("=" * 50)
-    app = create_app(INDEX_HTML)
+    app = create_app(game=GAME)
     run_server(app, port=8080)
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# hub.py
+# Tüm oyunları tek sunucuda çalıştırır: /tombala/, /kkm/, /trustnoone/ ...
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lan.lan_server import create_hub_app, discover_games, run_server
+
+def main():
+    games = discover_games()
+    print("Oyun merkezi:")
+    for game in games:
+        print(f"  /{game.name}/  {game.title}")
+    app = create_hub_app(games)
+    run_server(app, port=8080)
+
+if __name__ == "__main__":
+    main()
@@ -1,94 +1,1125 @@
 # lan_server.py
 # LAN sunucusu - WebSocket üzerinden çok oyunculu oyunlar için
 
+import argparse
 import asyncio
+import contextvars
+import importlib
 import json
+import os
+import secrets
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from collections import deque
+from collections.abc import MutableMapping, MutableSet
+from functools import cached_property
+import aiohttp
 from aiohttp import web, WSMsgType
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 HOST = "0.0.0.0"
 PORT = 8080
 
+# --- Yayın ayarları ---
+OUTBOX_SIZE = 256              # Bağlantı başına bekleyebilecek en fazla mesaj
+OVERFLOW_POLICY = "drop_oldest"  # Kuyruk dolunca: "drop_oldest", "coalesce" veya "disconnect"
+OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+STATE_TICK = 0.05              # Durum yayınları arasındaki en kısa süre (saniye)
+SLOW_HANDLER = 0.5             # Bu süreden (saniye) uzun süren mesaj işleyicileri uyarılır
+JSON_BACKEND = "auto"          # "auto", "orjson", "msgspec" veya "json"
+COMPRESS = True                # permessage-deflate müzakere edilsin mi
+COMPRESS_THRESHOLD = 1024      # Bu boyuttan (bayt) küçük mesajlar sıkıştırılmaz
+COMPRESS_LEVEL = 1             # zlib seviyesi: 1 hızlı, 9 en küçük
+COMPRESS_SHARED = True         # True: mesaj bir kez sıkıştırılır, tüm istemcilere aynı baytlar
+                               # False: istemci başına sıkıştırma bağlamı (daha iyi oran, daha çok CPU)
+WIRE_JSON = "klan.json"        # WebSocket alt protokolleri
+WIRE_MSGPACK = "klan.msgpack"
+
+# --- Oda ayarları ---
+DEFAULT_ROOM = "main"          # /ws?room=... verilmezse kullanılan oda
+MAX_ROOMS = 100                # Aynı anda açık olabilecek en fazla oda
+ROOM_ID_MAX = 32               # Oda adının en fazla uzunluğu
+SESSION_GRACE = 120            # Bağlantısı kopan oyuncu bu süre (saniye) kayıtlı kalır ve jetonuyla geri dönebilir
+
+# --- Bağlantı kabulü ---
+ADMIT_RATE = 200               # Saniyede kabul edilen en fazla WebSocket el sıkışması (0: sınırsız)
+ADMIT_BURST = 50               # Beklemeden kabul edilen ani bağlantı sayısı
+ADMIT_QUEUE = 2000             # Sırada bekleyebilecek en fazla bağlantı; aşılırsa 503
+
+# --- Çok süreçli çalışma ---
+WORKERS = 1                    # Aynı portu SO_REUSEPORT ile paylaşan işçi süreç sayısı
+FORWARD_HEADER = "X-KLAN-Forwarded"  # İşçiler arası aktarılan bağlantının istemci protokolü
+EVENT_LOOP = "asyncio"         # "asyncio", "uvloop" veya "auto" (kuruluysa uvloop)
+EVENT_LOOPS = ("asyncio", "uvloop", "auto")
+
 # --- Hafıza durumu ---
-clients = set()                # WebSocket bağlantıları
-players = {}                   # player_id -> {"name": str, "score": int}
-player_by_ws = {}              # ws -> player_id
+rooms = {}                     # (oyun adı, room_id) -> Room
+room_by_ws = {}                # ws -> Room
+outboxes = {}                  # ws -> Outbox
+binary_ws = set()              # MessagePack konuşan bağlantılar
+_background_tasks = set()      # Arka plan görevleri (GC'ye karşı güçlü referans)
+_room_var = contextvars.ContextVar("klan_room", default=None)
+_worker_id = 0                 # Bu sürecin işçi numarası
+_worker_count = 1
+_worker_sockets = []           # işçi numarası -> Unix soket yolu
+_worker_sessions = {}          # işçi numarası -> ClientSession (UnixConnector)
+_admit_tat = 0.0               # Kabul sırasındaki bir sonraki boş yerin zamanı (loop.time())
+_admit_waiting = 0             # Sırada bekleyen bağlantı sayısı
+
+# --- JSON kodlayıcıları ---
+# Hepsi aynı çıktıyı üretir: ASCII dışı karakterler kaçışsız (Türkçe isimler
+# olduğu gibi), ayraçlar boşluksuz. "auto" kurulu olan en hızlısını seçer:
+# orjson > msgspec > json.
+
+class JsonCodec:
+    """Standart kütüphane json modülü"""
+    name = "json"
+
+    def dumps(self, obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    def loads(self, data):
+        return json.loads(data)
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+class MsgspecCodec(JsonCodec):
+    name = "msgspec"
+
+    def __init__(self):
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+def available_json_codecs():
+    """Bu ortamda kullanılabilen kodlayıcılar (hızlıdan yavaşa)"""
+    codecs = []
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+    if msgspec is not None:
+        codecs.append(MsgspecCodec())
+    codecs.append(JsonCodec())
+    return codecs
+
+def set_json_codec(name="auto"):
+    """Kullanılacak JSON kodlayıcısını seç"""
+    global json_codec
+    codecs = {c.name: c for c in available_json_codecs()}
+    if name == "auto":
+        json_codec = next(iter(codecs.values()))
+    elif name in codecs:
+        json_codec = codecs[name]
+    else:
+        raise ValueError(f"JSON kodlayıcısı bulunamadı: {name}")
+    return json_codec
+
+json_codec = set_json_codec(JSON_BACKEND)
+
+# --- İkili protokol (MessagePack) ---
+# İstemci "klan.msgpack" alt protokolünü ya da /ws?wire=msgpack ile isterse
+# sunucu ona ikili çerçeveler gönderir. msgspec veya msgpack kurulu değilse
+# herkes JSON metin çerçeveleriyle devam eder.
+
+class MsgpackCodec:
+    """msgpack paketi"""
+    name = "msgpack"
+
+    def dumps(self, obj):
+        return msgpack.packb(obj, use_bin_type=True)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+class MsgspecMsgpackCodec(MsgpackCodec):
+    name = "msgspec.msgpack"
+
+    def __init__(self):
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder()
+
+    def dumps(self, obj):
+        return self._encoder.encode(obj)
+
+    def loads(self, data):
+        return self._decoder.decode(data)
+
+if msgspec is not None:
+    binary_codec = MsgspecMsgpackCodec()
+elif msgpack is not None:
+    binary_codec = MsgpackCodec()
+else:
+    binary_codec = None
+
+def wire_protocols():
+    """Sunucunun kabul ettiği alt protokoller (tercih sırasıyla)"""
+    if binary_codec is None:
+        return (WIRE_JSON,)
+    return (WIRE_MSGPACK, WIRE_JSON)
+
+# --- WebSocket çerçeveleri ---
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+
+RSV1_DEFLATE = 0x40
+
+def encode_frame(data: bytes, opcode=OP_TEXT, rsv=0):
+    """Sunucudan istemciye giden (maskesiz, tek parça) WebSocket çerçevesi üret"""
+    first = 0x80 | rsv | opcode
+    n = len(data)
+    if n < 126:
+        header = struct.pack("!BB", first, n)
+    elif n < 65536:
+        header = struct.pack("!BBH", first, 126, n)
+    else:
+        header = struct.pack("!BBQ", first, 127, n)
+    return header + data
+
+def deflate_frame(data: bytes, opcode, wbits):
+    """Mesajı bağımsız (önceki mesajlara referans vermeyen) permessage-deflate çerçevesi yap.
+
+    Her mesaj taze bir sıkıştırıcıyla işlendiği için sonuç, bağlam
+    taşıyan ya da taşımayan her istemcide aynı şekilde açılır.
+    """
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, -wbits)
+    body = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    if body.endswith(b"\x00\x00\xff\xff"):
+        body = body[:-4]
+    if len(body) >= len(data):
+        return encode_frame(data, opcode)
+    return encode_frame(body, opcode, RSV1_DEFLATE)
+
+class Payload(str):
+    """Bir kez kodlanan mesaj.
+
+    Normal bir `str` gibi kullanılabilir; `frame` ilk erişimde UTF-8'e
+    çevrilip çerçevelenir ve saklanır, böylece yayında tüm istemcilere
+    aynı baytlar yazılır.
+    """
+
+    @classmethod
+    def wrap(cls, raw):
+        """Kodlayıcı çıktısından (str veya UTF-8 bytes) Payload oluştur"""
+        if isinstance(raw, str):
+            return cls(raw)
+        payload = cls(raw.decode("utf-8"))
+        payload.__dict__["data"] = raw
+        return payload
+
+    @cached_property
+    def data(self):
+        return self.encode("utf-8")
+
+    @cached_property
+    def frame(self):
+        return encode_frame(self.data)
+
+    @cached_property
+    def packed(self):
+        # build_payload ikili istemci yokken üretildiyse JSON'dan bir kez çevir
+        return binary_codec.dumps(json_codec.loads(self.data))
+
+    @cached_property
+    def binary_frame(self):
+        return encode_frame(self.packed, OP_BINARY)
+
+    def frame_for(self, binary=False, wbits=0):
+        """İstemcinin protokolüne ve sıkıştırmasına uygun çerçeve"""
+        data = self.packed if binary else self.data
+        if not wbits or len(data) < COMPRESS_THRESHOLD:
+            return self.binary_frame if binary else self.frame
+        # Sıkıştırılmış çerçeve (protokol, pencere) başına bir kez üretilir
+        frames = self.__dict__.setdefault("_deflated", {})
+        key = (binary, wbits)
+        frame = frames.get(key)
+        if frame is None:
+            frame = deflate_frame(data, OP_BINARY if binary else OP_TEXT, wbits)
+            frames[key] = frame
+        return frame
 
 def build_payload(type_, **data):
     out = {"type": type_}
     out.update(data)
-    return json.dumps(out, ensure_ascii=False)
+    payload = Payload.wrap(json_codec.dumps(out))
+    if binary_ws:
+        # Sözlük daha sonra değişebilir; MessagePack kodlamasını şimdi yap
+        payload.__dict__["packed"] = binary_codec.dumps(out)
+    return payload
 
-async def broadcast(msg: str):
-    dead = []
-    for ws in clients:
+class Outbox:
+    """Bir bağlantının sınırlı giden kuyruğu ve yazıcı görevi.
+
+    Mesajlar kuyruğa anında eklenir, gönderimi bağlantıya ait görev yapar;
+    böylece yavaş bir istemci diğerlerinin yayınını bekletmez.
+    """
+
+    def __init__(self, ws, maxsize=None, policy=None):
+        self.ws = ws
+        self.maxsize = maxsize or OUTBOX_SIZE
+        self.policy = policy or OVERFLOW_POLICY
+        if self.policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Bilinmeyen taşma politikası: {self.policy}")
+        self.queue = deque()   # (coalesce_key, msg)
+        self.binary = False    # MessagePack çerçeveleri mi gönderilecek
+        self.wbits = 0         # Müzakere edilen deflate penceresi (0: sıkıştırma yok)
+        self.shared = COMPRESS_SHARED
+        self.dropped = 0
+        self.closed = False
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    def put(self, msg, key=None):
+        """Mesajı kuyruğa ekle; bağlantı kapatılacaksa False döner"""
+        if self.closed:
+            return False
+        if len(self.queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                self.close()
+                _spawn(_drop_client(self.ws))
+                return False
+            if self.policy == "coalesce" and key == "state":
+                # İki yama birleştirilemez: bekleyen tüm durum mesajlarının
+                # yerine odanın güncel tam durumu gider, sürüm boşluğu kalmaz
+                room = room_by_ws.get(self.ws)
+                if room is not None:
+                    msg = room.snapshot()
+                kept = deque(item for item in self.queue if item[0] != "state")
+                if len(kept) == len(self.queue):
+                    kept.popleft()
+                self.queue = kept
+            elif self.policy == "coalesce" and key is not None:
+                # Aynı anahtarlı eski mesajın yerine yenisini koy
+                for i, (k, _) in enumerate(self.queue):
+                    if k == key:
+                        del self.queue[i]
+                        break
+                else:
+                    self.queue.popleft()
+            else:
+                self.queue.popleft()
+            self.dropped += 1
+        self.queue.append((key, msg))
+        self._wakeup.set()
+        return True
+
+    async def _run(self):
+        ws = self.ws
         try:
-            await ws.send_str(msg)
-        except:
-            dead.append(ws)
-    for ws in dead:
-        await unregister(ws)
+            while not self.closed:
+                if not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, msg = self.queue.popleft()
+                if not isinstance(msg, Payload):
+                    msg = Payload(msg)
+                if self.wbits and not self.shared and len(msg.data) >= COMPRESS_THRESHOLD:
+                    # İstemciye özel bağlamla aiohttp sıkıştırsın
+                    if self.binary:
+                        await ws.send_bytes(msg.packed)
+                    else:
+                        await ws.send_str(msg)
+                else:
+                    await write_frame(ws, msg.frame_for(self.binary, self.wbits))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Yazılamayan bağlantıyı kapat
+            self.close()
+            await _drop_client(ws)
 
-async def register(ws, player_name):
-    import random
-    pid = f"p{random.randint(100000, 999999)}"
-    players[pid] = {"name": player_name[:24] or "Guest", "score": 0}
-    player_by_ws[ws] = pid
-    await send_state()
-    return pid
+    def close(self):
+        self.closed = True
+        self.queue.clear()
+        self._wakeup.set()
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
 
-async def unregister(ws):
-    pid = player_by_ws.get(ws)
-    if pid:
-        players.pop(pid, None)
-    player_by_ws.pop(ws, None)
-    if ws in clients:
-        clients.remove(ws)
+async def write_frame(ws, frame: bytes):
+    """Hazır çerçeveyi doğrudan bağlantının transport'una yaz"""
+    writer = getattr(ws, "_writer", None)
+    transport = getattr(writer, "transport", None)
+    protocol = getattr(writer, "protocol", None)
+    if ws.closed or transport is None or transport.is_closing():
+        raise ConnectionResetError("Bağlantı kapalı")
+    transport.write(frame)
+    # Akış kontrolü: istemcinin tamponu doluysa boşalmasını bekle
+    if getattr(protocol, "_paused", False):
+        await protocol._drain_helper()
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def open_outbox(ws):
+    """Yeni bağlantı için giden kuyruğu oluştur"""
+    outbox = Outbox(ws)
+    outboxes[ws] = outbox
+    return outbox
+
+def close_outbox(ws):
+    outbox = outboxes.pop(ws, None)
+    if outbox:
+        outbox.close()
+
+async def _drop_client(ws):
+    await unregister(ws)
     try:
-        await send_state()
+        if not ws.closed:
+            await ws.close()
     except:
         pass
 
+def send(ws, msg: str, key=None):
+    """Tek bir bağlantıya mesaj gönder (beklemeden kuyruğa ekler)"""
+    outbox = outboxes.get(ws)
+    if outbox:
+        return outbox.put(msg, key)
+    return False
+
+# --- Odalar ---
+class Room:
+    """Tek bir oyun masası.
+
+    Her odanın kendi oyuncu kaydı, oyun durumu ve yayın grubu vardır; tek
+    bir süreç /ws?room=... ile birçok masayı aynı olay döngüsünde sunar.
+    Bağlantının görevi (ve ondan başlatılan görevler) odasını bağlamda
+    taşır, bu yüzden oyun kodu `broadcast`, `players`, `mark_dirty` gibi
+    modül düzeyindeki adları kullanmaya devam eder.
+    """
+
+    def __init__(self, room_id, game=None):
+        self.id = room_id
+        self.game = game           # Game eklentisi (None: modül düzeyindeki kancalar)
+        self.clients = set()       # WebSocket bağlantıları
+        self.players = {}          # player_id -> {"name": str, "score": int}
+        self.player_by_ws = {}     # ws -> player_id
+        self.ws_by_player = {}     # player_id -> ws (ters indeks)
+        self.sessions = {}         # oturum jetonu -> player_id
+        self.token_by_player = {}  # player_id -> oturum jetonu
+        self.away = {}             # player_id -> bağlantısı kopan oyuncuyu silecek tutamaç
+        self.last_pid = 0          # Son verilen oyuncu numarası (kimlikler yeniden kullanılmaz)
+        self.locals = {}           # id(RoomLocal) -> bu odadaki değeri
+        self.state_version = 0     # Son yayınlanan durum sürümü
+        self.last_state = {}       # Son yayınlanan tam durum (kopya)
+        self._snapshot = None      # Güncel sürümün tam durum Payload'ı
+        self._state_timer = None   # Bekleyen durum yayını (loop.call_later tutamacı)
+        self.timers = {}           # ad -> (loop.call_at tutamacı, bitiş zamanı epoch ms)
+        self.tasks = {}            # Task -> ad (odanın izlenen oyun görevleri)
+
+    def __repr__(self):
+        name = self.game.name if self.game else "-"
+        return f"<Room {name}/{self.id} {len(self.clients)} bağlantı>"
+
+    @property
+    def key(self):
+        return (self.game.name if self.game else None, self.id)
+
+    async def call(self, fn, *args):
+        """fn'i bu oda geçerli oda olacak şekilde çalıştır"""
+        token = _room_var.set(self)
+        try:
+            return await fn(*args)
+        finally:
+            _room_var.reset(token)
+
+    def spawn(self, fn, *args):
+        """Bu odanın bağlamında arka plan görevi başlat"""
+        return _spawn(self.call(fn, *args))
+
+    def broadcast(self, msg, key=None):
+        """Mesajı odadaki tüm bağlantıların kuyruğuna ekle"""
+        for ws in list(self.clients):
+            send(ws, msg, key)
+
+    def send_to(self, pid, msg, key=None):
+        ws = self.ws_by_player.get(pid)
+        if ws is None:
+            return False
+        return send(ws, msg, key)
+
+    def publish_state(self, state):
+        patch = diff_state(self.last_state, state)
+        if not patch:
+            return
+        self.state_version += 1
+        self.last_state = _clone(state)
+        self._snapshot = None
+        v = self.state_version
+        self.broadcast(build_payload("state_patch", v=v, base=v - 1, **patch), key="state")
+
+    def snapshot(self):
+        """Güncel tam durum mesajı (sürüm başına bir kez kodlanır)"""
+        if self._snapshot is None:
+            self._snapshot = build_payload("state", v=self.state_version, **self.last_state)
+        return self._snapshot
+
+    def mark_dirty(self):
+        if self._state_timer is None:
+            loop = asyncio.get_running_loop()
+            self._state_timer = loop.call_later(STATE_TICK, self._flush_state)
+
+    def _flush_state(self):
+        self._state_timer = None
+        self.spawn(_send_state)
+
+    async def flush_state(self):
+        if self._state_timer is not None:
+            self._state_timer.cancel()
+            self._state_timer = None
+        await self.call(_send_state)
+
+    def set_timer(self, name, delay, fn, *args):
+        """`delay` saniye sonra fn(*args)'ı bu odada çalıştır.
+
+        Aynı adlı bekleyen zamanlayıcı iptal edilir. Bitiş zamanını (epoch ms)
+        döndürür; istemciler bunu bir kez alıp yerelde geri sayar.
+        """
+        self.cancel_timer(name)
+        loop = asyncio.get_running_loop()
+        handle = loop.call_at(loop.time() + delay, self._fire_timer, name, fn, args)
+        deadline = int((time.time() + delay) * 1000)
+        self.timers[name] = (handle, deadline)
+        return deadline
+
+    def _fire_timer(self, name, fn, args):
+        self.timers.pop(name, None)
+        self._track(f"timer:{name}", self.spawn(fn, *args))
+
+    def cancel_timer(self, name):
+        """Bekleyen zamanlayıcıyı iptal et; yoksa False"""
+        entry = self.timers.pop(name, None)
+        if entry is None:
+            return False
+        entry[0].cancel()
+        return True
+
+    def timer_deadline(self, name):
+        entry = self.timers.get(name)
+        return entry[1] if entry else None
+
+    def start_task(self, name, fn, *args):
+        """Uzun süren oyun akışını izlenen görev olarak başlat.
+
+        Aynı adlı çalışan görev iptal edilir; bitince kayıttan düşer, hata
+        verirse raporlanır.
+        """
+        self.cancel_task(name)
+        return self._track(name, self.spawn(fn, *args))
+
+    def _track(self, name, task):
+        self.tasks[task] = name
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        name = self.tasks.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"⚠️  {self!r}: '{name}' görevi hata verdi: {task.exception()!r}")
+
+    def cancel_task(self, name):
+        """Adlı görevi iptal et (çağıran görevin kendisi hariç)"""
+        current = asyncio.current_task()
+        found = False
+        for task, task_name in list(self.tasks.items()):
+            if task_name == name and task is not current:
+                task.cancel()
+                found = True
+        return found
+
+    def cancel_tasks(self):
+        """Odanın tüm oyun görevlerini ve zamanlayıcılarını iptal et"""
+        for handle, _ in self.timers.values():
+            handle.cancel()
+        self.timers.clear()
+        current = asyncio.current_task()
+        for task in list(self.tasks):
+            if task is not current:
+                task.cancel()
+
+    def running_tasks(self):
+        """Çalışan görevlerin adları"""
+        return sorted(self.tasks.values())
+
+    # --- Oturumlar ---
+    # Katılan her oyuncuya bir jeton verilir. Bağlantı koparsa oyuncu hemen
+    # silinmez; SESSION_GRACE boyunca "away" haritasında bekler ve jetonla
+    # gelen yeni bağlantı aynı oyuncuya (skor, kart, rol) sözlük aramasıyla bağlanır.
+
+    def new_player_id(self):
+        """Odada benzersiz, kısa oyuncu kimliği: "p1", "p2", ... "pz", "p10" (36 tabanı).
+
+        Sayaç yalnızca artar; süresi dolan oturumun kimliği başka oyuncuya
+        verilmez. Kimlik tek bir str nesnesi olarak saklanır (intern), tüm
+        sözlükler ve mesajlar aynı nesneyi paylaşır.
+        """
+        self.last_pid += 1
+        return sys.intern("p" + _base36(self.last_pid))
+
+    def new_session(self, pid):
+        token = secrets.token_urlsafe(16)
+        self.sessions[token] = pid
+        self.token_by_player[pid] = token
+        return token
+
+    def attach(self, ws, pid):
+        """Bağlantıyı oyuncuya bağla (katılma veya yeniden bağlanma)"""
+        handle = self.away.pop(pid, None)
+        if handle is not None:
+            handle.cancel()
+        old = self.ws_by_player.get(pid)
+        if old is not None and old is not ws:
+            # Oturum yeni bağlantıdan döndü; eski (yarı açık) bağlantı artık oyuncu değil
+            self.player_by_ws.pop(old, None)
+        self.player_by_ws[ws] = pid
+        self.ws_by_player[pid] = ws
+
+    def resume(self, ws, token):
+        """Jetonun oyuncusunu bu bağlantıya geri bağla; geçersizse None"""
+        pid = self.sessions.get(token) if isinstance(token, str) else None
+        if pid is None or pid not in self.players:
+            return None
+        old_pid = self.player_by_ws.get(ws)
+        if old_pid is not None and old_pid != pid:
+            self.drop_player(old_pid)
+        self.attach(ws, pid)
+        return pid
+
+    def detach(self, ws):
+        """Bağlantı kapandı: oyuncuyu SESSION_GRACE boyunca beklet"""
+        pid = self.player_by_ws.pop(ws, None)
+        if pid is None or self.ws_by_player.get(pid) is not ws:
+            return pid
+        del self.ws_by_player[pid]
+        if SESSION_GRACE and pid in self.token_by_player:
+            loop = asyncio.get_running_loop()
+            self.away[pid] = loop.call_later(SESSION_GRACE, self._expire_session, pid)
+        else:
+            self.drop_player(pid)
+        return pid
+
+    def _expire_session(self, pid):
+        self.away.pop(pid, None)
+        self.drop_player(pid)
+        self.mark_dirty()
+        _release_room(self)
+
+    def drop_player(self, pid):
+        """Oyuncuyu ve oturumunu tamamen sil"""
+        self.players.pop(pid, None)
+        ws = self.ws_by_player.pop(pid, None)
+        if ws is not None:
+            self.player_by_ws.pop(ws, None)
+        token = self.token_by_player.pop(pid, None)
+        if token is not None:
+            self.sessions.pop(token, None)
+        handle = self.away.pop(pid, None)
+        if handle is not None:
+            handle.cancel()
+
+    def close(self):
+        if self._state_timer is not None:
+            self._state_timer.cancel()
+            self._state_timer = None
+        for handle in self.away.values():
+            handle.cancel()
+        self.away.clear()
+        self.cancel_tasks()
+
+def _base36(n):
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    out = ""
+    while True:
+        n, r = divmod(n, 36)
+        out = digits[r] + out
+        if not n:
+            return out
+
+def _room_id(raw):
+    room_id = (raw or "").strip()[:ROOM_ID_MAX]
+    return room_id or DEFAULT_ROOM
+
+def get_room(room_id=None, create=True, game=None):
+    """Oyunun odasını bul; yoksa (sınır aşılmadıysa) oluştur"""
+    room_id = _room_id(room_id)
+    key = (game.name if game else None, room_id)
+    room = rooms.get(key)
+    if room is None and create and len(rooms) < MAX_ROOMS:
+        room = rooms[key] = Room(room_id, game)
+    return room
+
+def current_room():
+    """Çalışan görevin odası (bağlam yoksa varsayılan oda)"""
+    room = _room_var.get()
+    if room is None:
+        room = get_room(DEFAULT_ROOM)
+    return room
+
+def _release_room(room):
+    # Boşalan odayı kapat (varsayılan oda hep açık kalır; geri dönmesi beklenen oyuncu varsa açık kalır)
+    if not room.clients and not room.away and room.id != DEFAULT_ROOM and rooms.get(room.key) is room:
+        del rooms[room.key]
+        room.close()
+
+class RoomLocal(MutableMapping):
+    """Her oda için ayrı tutulan sözlük.
+
+    Oyun modülleri durumlarını böyle tanımlar:
+        game_state = RoomLocal(lambda: {"started": False, ...})
+    Erişim, çalışan görevin odasındaki kopyaya yönlenir.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+
+    def _target(self):
+        room = current_room()
+        value = room.locals.get(id(self))
+        if value is None:
+            value = room.locals[id(self)] = self._factory()
+        return value
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __setitem__(self, key, value):
+        self._target()[key] = value
+
+    def __delitem__(self, key):
+        del self._target()[key]
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self):
+        return len(self._target())
+
+    def __repr__(self):
+        return repr(self._target())
+
+class _RoomDict(RoomLocal):
+    """Geçerli odanın bir sözlük alanına vekil (players, player_by_ws ...)"""
+
+    def __init__(self, attr):
+        self._attr = attr
+
+    def _target(self):
+        return getattr(current_room(), self._attr)
+
+class _RoomSet(MutableSet):
+    """Geçerli odanın bağlantı kümesine vekil"""
+
+    def _target(self):
+        return current_room().clients
+
+    def __contains__(self, ws):
+        return ws in self._target()
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self):
+        return len(self._target())
+
+    def add(self, ws):
+        self._target().add(ws)
+
+    def discard(self, ws):
+        self._target().discard(ws)
+
+# Tek odalı eski API: geçerli odanın kayıtları
+clients = _RoomSet()
+players = _RoomDict("players")
+player_by_ws = _RoomDict("player_by_ws")
+ws_by_player = _RoomDict("ws_by_player")
+
+async def broadcast(msg: str, key=None):
+    """Mesajı odadaki tüm bağlantıların kuyruğuna ekle.
+
+    `key` verilirse "coalesce" politikasında kuyruktaki aynı anahtarlı
+    eski mesajın yerini alır (ör. "state").
+    """
+    current_room().broadcast(msg, key)
+
+# --- Delta durum protokolü ---
+# İstemci bağlanınca tam durumu ("state", v=n) alır; sonrasında yalnızca
+# değişen alanlar "state_patch" ile gönderilir:
+#   set    -> değeri değişen / yeni alanlar
+#   del    -> kaldırılan alanlar
+#   append -> sonuna eleman eklenen listeler (ör. drawn_numbers)
+#   items  -> "id" alanlı sözlük listeleri için {"upsert": [...], "remove": [...]}
+# Yamanın "base" sürümü istemcidekiyle eşleşmezse istemci "state_sync" ister.
+
+def _clone(value):
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    return value
+
+def _diff_items(old, new):
+    """id'li sözlük listeleri için (upsert, remove); sıra korunamıyorsa None"""
+    if not all(isinstance(x, dict) and "id" in x for x in old):
+        return None
+    if not all(isinstance(x, dict) and "id" in x for x in new):
+        return None
+    old_by_id = {x["id"]: x for x in old}
+    new_ids = [x["id"] for x in new]
+    new_set = set(new_ids)
+    # Yama uygulandığında sıra: kalanlar eski sırada, yeniler sonda
+    kept = [i for i in old_by_id if i in new_set]
+    added = [i for i in new_ids if i not in old_by_id]
+    if kept + added != new_ids:
+        return None
+    upsert = [x for x in new if old_by_id.get(x["id"]) != x]
+    remove = [i for i in old_by_id if i not in new_set]
+    return upsert, remove
+
+def diff_state(old, new):
+    """İki durum arasındaki yamayı üret (değişiklik yoksa boş sözlük)"""
+    patch_set, patch_append, patch_items = {}, {}, {}
+    for key, value in new.items():
+        if key not in old:
+            patch_set[key] = value
+            continue
+        prev = old[key]
+        if prev == value:
+            continue
+        if isinstance(prev, list) and isinstance(value, list):
+            n = len(prev)
+            if len(value) > n and value[:n] == prev:
+                patch_append[key] = value[n:]
+                continue
+            items = _diff_items(prev, value)
+            if items is not None:
+                upsert, remove = items
+                patch_items[key] = {"upsert": upsert, "remove": remove}
+                continue
+        patch_set[key] = value
+    patch_del = [key for key in old if key not in new]
+
+    patch = {}
+    if patch_set:
+        patch["set"] = patch_set
+    if patch_append:
+        patch["append"] = patch_append
+    if patch_items:
+        patch["items"] = patch_items
+    if patch_del:
+        patch["del"] = patch_del
+    return patch
+
+async def publish_state(state):
+    """Durumu yayınla: yalnızca bir önceki sürümden farkı gönderir"""
+    current_room().publish_state(state)
+
+def state_snapshot(room=None):
+    """Odanın güncel tam durum mesajı"""
+    return (room or current_room()).snapshot()
+
+def send_snapshot(ws):
+    """Bağlantıya tam durumu gönder (katılma, yeniden bağlanma veya senkron isteği)"""
+    room = room_by_ws.get(ws)
+    if room is None:
+        return False
+    return send(ws, room.snapshot(), key="state")
+
+# --- Durum yayın zamanlayıcısı ---
+def mark_dirty():
+    """Durumun değiştiğini bildir.
+
+    Yayın hemen yapılmaz; STATE_TICK içinde gelen tüm değişiklikler tek bir
+    send_state() çağrısında birleştirilir.
+    """
+    current_room().mark_dirty()
+
+async def _send_state():
+    # Odanın oyun eklentisi; yoksa (override edilmiş olabilecek) send_state
+    game = current_room().game
+    if game is not None and game.send_state is not None:
+        await game.send_state()
+    else:
+        await send_state()
+
+async def flush_state():
+    """Bekleyen durum yayınını beklemeden hemen yap"""
+    await current_room().flush_state()
+
+def send_to(pid, msg, key=None):
+    """Tek bir oyuncuya özel mesaj gönder (ör. your_card, your_role)"""
+    return current_room().send_to(pid, msg, key)
+
+# --- Zamanlayıcılar ---
+# Tüm odaların zamanlayıcıları olay döngüsünün tek zamanlayıcı yığınında
+# (loop.call_at) durur; oda başına uyuyan görev yoktur. Süreler mutlak
+# bitiş zamanına göre ölçüldüğünden yayın süresi kadar kayma olmaz.
+
+def set_timer(name, delay, fn, *args):
+    """Geçerli odada adlı zamanlayıcı kur; bitiş zamanını (epoch ms) döndürür"""
+    return current_room().set_timer(name, delay, fn, *args)
+
+def cancel_timer(name):
+    """Geçerli odanın adlı zamanlayıcısını iptal et"""
+    return current_room().cancel_timer(name)
+
+def timer_deadline(name):
+    """Bekleyen zamanlayıcının bitiş zamanı (epoch ms) veya None"""
+    return current_room().timer_deadline(name)
+
+# --- Oyun görevleri ---
+# Mesaj işleyicileri uzun akışları beklememeli (bağlantının okuma döngüsü
+# durur); döngüler start_task ile odanın gözetimine verilir ve oyun
+# sıfırlanınca cancel_tasks ile hepsi birden durdurulur.
+
+def start_task(name, fn, *args):
+    """Geçerli odada adlı, izlenen görev başlat"""
+    return current_room().start_task(name, fn, *args)
+
+def cancel_task(name):
+    return current_room().cancel_task(name)
+
+def cancel_tasks():
+    """Geçerli odanın tüm oyun görevlerini ve zamanlayıcılarını iptal et"""
+    current_room().cancel_tasks()
+
+async def register(ws, player_name):
+    room = room_by_ws[ws]
+    pid = room.new_player_id()
+    old_pid = room.player_by_ws.get(ws)
+    if old_pid:
+        # Aynı bağlantı tekrar katıldı: eski oyuncu kaydını bırak
+        room.drop_player(old_pid)
+    room.players[pid] = {"name": player_name[:24] or "Guest", "score": 0}
+    room.attach(ws, pid)
+    room.new_session(pid)
+    # Oyuncu listesi hemen değil, STATE_TICK içindeki diğer katılımlarla tek yamada yayınlanır
+    room.mark_dirty()
+    return pid
+
+async def unregister(ws):
+    room = room_by_ws.pop(ws, None)
+    binary_ws.discard(ws)
+    close_outbox(ws)
+    if room is None:
+        return
+    # Oyuncu hemen silinmez; SESSION_GRACE içinde jetonuyla geri dönebilir
+    pid = room.detach(ws)
+    room.clients.discard(ws)
+    room.mark_dirty()
+    game = room.game
+    if pid is not None and game is not None and game.on_disconnect is not None:
+        await room.call(game.on_disconnect, pid)
+    _release_room(room)
+
 async def send_state():
     """Oyun durumunu yayınla - alt sınıflar tarafından override edilebilir"""
     state = {
         "players": [{"id": pid, "name": p["name"], "score": p["score"]} for pid, p in players.items()],
     }
-    await broadcast(build_payload("state", **state))
+    await publish_state(state)
 
 async def handle_game_message(ws, data):
     """Oyun mesajlarını işle - alt sınıflar tarafından override edilmeli"""
     pass
 
+# --- Oyun eklentileri ---
+class Game:
+    """Bir oyunun sunucuya verdiği kancalar.
+
+    name            URL yolu ve kayıt adı ("tombala" -> /tombala/)
+    index_html      oyun sayfası
+    handle_message  async (ws, data): oyuna özel mesajlar
+    send_state      async (): durumu oluşturup publish_state ile yayınlar
+    title           oyun merkezi sayfasında görünen ad
+    on_resume       async (ws, pid): yeniden bağlanan oyuncuya özel verisini (kart, rol) gönderir
+    on_disconnect   async (pid): oyuncunun bağlantısı koptu (kayıt SESSION_GRACE boyunca durur);
+                    "herkes seçti mi" gibi kontroller burada yeniden yapılır
+    """
+
+    def __init__(self, name, index_html, handle_message=None, send_state=None, title=None, on_resume=None,
+                 on_disconnect=None):
+        self.name = name
+        self.index_html = index_html
+        self.handle_message = handle_message
+        self.send_state = send_state
+        self.title = title or name
+        self.on_resume = on_resume
+        self.on_disconnect = on_disconnect
+
+    def __repr__(self):
+        return f"<Game {self.name}>"
+
+async def _handle_game_message(room, ws, data):
+    game = room.game
+    handler = game.handle_message if game is not None and game.handle_message is not None else handle_game_message
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await handler(ws, data)
+    elapsed = loop.time() - started
+    if elapsed > SLOW_HANDLER:
+        # Bu sürede bağlantının diğer mesajları okunmadı
+        print(f"⚠️  {room!r}: '{data.get('type')}' işleyicisi {elapsed:.1f} sn sürdü; uzun akışlar start_task ile başlatılmalı")
+
+def discover_games(games_dir=None):
+    """games/ klasöründeki *_game.py modüllerinden GAME eklentilerini topla"""
+    if games_dir is None:
+        games_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "games")
+    found = []
+    for file in sorted(os.listdir(games_dir)):
+        if not file.endswith("_game.py"):
+            continue
+        module = importlib.import_module(f"games.{file[:-3]}")
+        game = getattr(module, "GAME", None)
+        if isinstance(game, Game):
+            found.append(game)
+    return found
+
 # --- WebSocket Handler ---
-async def ws_handler(request):
-    ws = web.WebSocketResponse(heartbeat=20)
+def _wants_binary(ws, request):
+    return binary_codec is not None and (
+        ws.ws_protocol == WIRE_MSGPACK or request.query.get("wire") == "msgpack"
+    )
+
+async def _admit():
+    """Bağlantıyı kabul sırasına al; sıra doluysa False.
+
+    GCRA (sanal sıra): her bağlantı 1/ADMIT_RATE aralıklı bir yer ayırır ve
+    yerinin zamanı gelene kadar uyur. İlk ADMIT_BURST bağlantı beklemez;
+    sıra gelişe göredir ve bekleyen başına yalnızca bir uyuyan görev vardır.
+    """
+    global _admit_tat, _admit_waiting
+    if not ADMIT_RATE:
+        return True
+    loop = asyncio.get_running_loop()
+    now = loop.time()
+    interval = 1 / ADMIT_RATE
+    tat = max(_admit_tat, now)
+    wait = tat - now - (ADMIT_BURST - 1) * interval
+    if wait <= 0:
+        _admit_tat = tat + interval
+        return True
+    if _admit_waiting >= ADMIT_QUEUE:
+        return False
+    _admit_tat = tat + interval
+    _admit_waiting += 1
+    try:
+        await asyncio.sleep(wait)
+    finally:
+        _admit_waiting -= 1
+    return True
+
+async def ws_handler(request, game=None):
+    room_id = _room_id(request.query.get("room"))
+    forwarded = _forwarded_wire(request)
+    # Aynı anda gelen bağlantılar sıraya girer (aktarılanlar ilk işçide zaten sıra beklemiştir)
+    if forwarded is None and not await _admit():
+        return web.Response(status=503, text="Sunucu yoğun, tekrar deneyin", headers={"Retry-After": "1"})
+    if forwarded is None and _worker_count > 1:
+        # Oda başka bir işçiye aitse bağlantıyı ona aktar
+        owner = room_owner(room_id, game)
+        if owner != _worker_id:
+            return await _proxy_ws(request, owner)
+
+    room = get_room(room_id, game=game)
+    if room is None:
+        return web.Response(status=503, text="Oda sınırına ulaşıldı")
+    # Bu bağlantının görevi ve başlattığı tüm görevler bu odada çalışır
+    _room_var.set(room)
+
+    ws = web.WebSocketResponse(heartbeat=20, protocols=wire_protocols(), compress=COMPRESS)
     await ws.prepare(request)
-    clients.add(ws)
-    await ws.send_str(build_payload("hello"))
+    # Aktarılan bağlantılar işçiler arasında JSON konuşur; istemci protokolünü vekil uygular
+    binary = forwarded is None and _wants_binary(ws, request)
+    if not room.state_version:
+        # Yeni oda henüz hiç durum yayınlamadı: ilk tam durum eksiksiz olsun
+        await room.call(_send_state)
+    room.clients.add(ws)
+    room_by_ws[ws] = room
+    outbox = open_outbox(ws)
+    outbox.wbits = ws.compress or 0
+    if binary:
+        outbox.binary = True
+        binary_ws.add(ws)
+    wire = forwarded or ("msgpack" if binary else "json")
+    # "now": istemci saat farkını bulur, bitiş zamanlarını yerel saate çevirir
+    send(ws, build_payload("hello", room=room.id, wire=wire, now=int(time.time() * 1000)))
+    send_snapshot(ws)
 
     try:
         async for msg in ws:
-            if msg.type == WSMsgType.TEXT:
+            if msg.type in (WSMsgType.TEXT, WSMsgType.BINARY):
                 try:
-                    data = json.loads(msg.data)
+                    if msg.type == WSMsgType.TEXT:
+                        data = json_codec.loads(msg.data)
+                    else:
+                        data = binary_codec.loads(msg.data)
                 except:
                     continue
+                if not isinstance(data, dict):
+                    continue
                 typ = data.get("type")
 
                 if typ == "join":
                     name = (data.get("name") or "Guest").strip()
                     pid = await register(ws, name)
-                    await ws.send_str(build_payload("joined", pid=pid, name=players[pid]["name"]))
+                    send(ws, build_payload("joined", pid=pid, name=room.players[pid]["name"],
+                                           token=room.token_by_player[pid]))
 
                 elif typ == "resume":
-                    # tekrar bağlanma senaryosu
-                    name = players.get(data.get("pid"), {"name":"Guest"})["name"]
-                    pid = await register(ws, name)
-                    await ws.send_str(build_payload("joined", pid=pid, name=name))
+                    # Yeniden bağlanma: jeton geçerliyse aynı oyuncu kaydına dönülür
+                    pid = room.resume(ws, data.get("token"))
+                    if pid is None:
+                        send(ws, build_payload("resume_failed"))
+                    else:
+                        send(ws, build_payload("joined", pid=pid, name=room.players[pid]["name"],
+                                               token=room.token_by_player[pid], resumed=True))
+                        if room.game is not None and room.game.on_resume is not None:
+                            await room.game.on_resume(ws, pid)
+
+                elif typ == "state_sync":
+                    # istemci bir yamayı kaçırdı, tam durumu yeniden gönder
+                    send_snapshot(ws)
 
                 else:
                     # Diğer mesajları oyun logiğine gönder
-                    await handle_game_message(ws, data)
+                    await _handle_game_message(room, ws, data)
 
             elif msg.type == WSMsgType.ERROR:
                 pass
@@ -106,31 +1137,324 @@ async def ws_handler(request):
             pass
     return ws
 
-def create_app(index_html=None):
-    """LAN server uygulaması oluştur"""
-    app = web.Application()
-    
+# --- İşçiler arası aktarım ---
+# WORKERS > 1 iken her oda, adının özetine göre tek bir işçiye aittir
+# (room_owner). Çekirdek bağlantıyı başka bir işçiye verdiyse bu işçi vekil
+# olur: istemciyle kendi kuyruğu üzerinden konuşur, oda olaylarını sahibin
+# Unix soketi üzerinden açılan WebSocket ile taşır.
+
+def room_owner(room_id, game=None):
+    """Odanın sahibi olan işçinin numarası (süreçler arasında kararlı)"""
+    key = f"{game.name if game else ''}/{_room_id(room_id)}"
+    return zlib.crc32(key.encode("utf-8")) % _worker_count
+
+def _forwarded_wire(request):
+    # Başlık yalnızca işçilerin Unix soketinden gelen isteklerde geçerlidir
+    if not isinstance(request.transport.get_extra_info("sockname"), str):
+        return None
+    wire = request.headers.get(FORWARD_HEADER)
+    return wire if wire in ("json", "msgpack") else None
+
+def _worker_session(worker):
+    session = _worker_sessions.get(worker)
+    if session is None or session.closed:
+        connector = aiohttp.UnixConnector(path=_worker_sockets[worker])
+        session = _worker_sessions[worker] = aiohttp.ClientSession(connector=connector)
+    return session
+
+async def _close_worker_sessions(app):
+    for session in _worker_sessions.values():
+        await session.close()
+    _worker_sessions.clear()
+
+async def _proxy_ws(request, owner):
+    ws = web.WebSocketResponse(heartbeat=20, protocols=wire_protocols(), compress=COMPRESS)
+    await ws.prepare(request)
+    binary = _wants_binary(ws, request)
+    outbox = open_outbox(ws)
+    outbox.wbits = ws.compress or 0
+    outbox.binary = binary
+
+    try:
+        upstream = await _worker_session(owner).ws_connect(
+            "http://klan" + request.path_qs,
+            headers={FORWARD_HEADER: "msgpack" if binary else "json"},
+        )
+    except Exception:
+        close_outbox(ws)
+        await ws.close()
+        return ws
+
+    async def downstream():
+        # Sahip işçiden gelen JSON mesajları istemcinin protokolüyle gönder
+        async for msg in upstream:
+            if msg.type == WSMsgType.TEXT:
+                send(ws, Payload(msg.data))
+        await ws.close()
+
+    task = _spawn(downstream())
+    try:
+        async for msg in ws:
+            if msg.type == WSMsgType.TEXT:
+                await upstream.send_str(msg.data)
+            elif msg.type == WSMsgType.BINARY:
+                await upstream.send_bytes(msg.data)
+            elif msg.type in (WSMsgType.CLOSE, WSMsgType.CLOSED, WSMsgType.CLOSING):
+                break
+    except Exception:
+        pass
+    finally:
+        task.cancel()
+        close_outbox(ws)
+        await upstream.close()
+        if not ws.closed:
+            await ws.close()
+    return ws
+
+# --- İstemci tarafı kütüphanesi ---
+# Oyun sayfaları <script src="lan_state.js"></script> ile yükler.
+#   LanWire.open(url) / LanWire.decode(ev.data) -> JSON veya MessagePack
+#   LanState.apply(msg, ws)                     -> "state" / "state_patch"
+#   LanClock.remaining(deadline)                -> bitiş zamanına kalan saniye
+STATE_CLIENT_JS = r"""// K-LAN istemci kütüphanesi
+// Sayfa adresine ?wire=msgpack eklenirse sunucudan ikili (MessagePack) mesaj istenir.
+// Sayfa adresindeki ?room=... WebSocket adresine aktarılır (aynı sunucuda farklı masalar).
+var LanWire = {
+  enabled: /[?&]wire=msgpack(&|$)/.test(location.search),
+  url: function () {
+    // Sayfanın bulunduğu yol: "/" veya oyun merkezinde "/tombala/"
+    var proto = location.protocol === 'https:' ? 'wss:' : 'ws:';
+    var base = location.pathname.replace(/[^\/]*$/, '');
+    return proto + '//' + location.host + base + 'ws';
+  },
+  open: function (url) {
+    url = url || this.url();
+    var room = new URLSearchParams(location.search).get('room');
+    if (room) url += (url.indexOf('?') < 0 ? '?' : '&') + 'room=' + encodeURIComponent(room);
+    var ws = this.enabled ? new WebSocket(url, ['klan.msgpack', 'klan.json']) : new WebSocket(url);
+    ws.binaryType = 'arraybuffer';
+    return ws;
+  },
+  decode: function (data) {
+    var msg = typeof data === 'string' ? JSON.parse(data) : LanWire.unpack(new Uint8Array(data));
+    if (msg && msg.type === 'hello' && msg.now) LanClock.sync(msg.now);
+    return msg;
+  },
+  unpack: function (buf) {
+    var view = new DataView(buf.buffer, buf.byteOffset, buf.byteLength), pos = 0;
+    var text = new TextDecoder();
+    function u(n) {
+      var v = n === 1 ? buf[pos] : n === 2 ? view.getUint16(pos) : n === 4 ? view.getUint32(pos)
+        : view.getUint32(pos) * 4294967296 + view.getUint32(pos + 4);
+      pos += n;
+      return v;
+    }
+    function str(n) { var s = text.decode(buf.subarray(pos, pos + n)); pos += n; return s; }
+    function bin(n) { var b = buf.slice(pos, pos + n); pos += n; return b; }
+    function arr(n) { var a = new Array(n); for (var i = 0; i < n; i++) a[i] = read(); return a; }
+    function map(n) { var o = {}; for (var i = 0; i < n; i++) { var k = read(); o[k] = read(); } return o; }
+    function read() {
+      var b = buf[pos++], v;
+      if (b < 0x80) return b;
+      if (b < 0x90) return map(b & 0x0f);
+      if (b < 0xa0) return arr(b & 0x0f);
+      if (b < 0xc0) return str(b & 0x1f);
+      if (b >= 0xe0) return b - 0x100;
+      switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xc4: return bin(u(1));
+        case 0xc5: return bin(u(2));
+        case 0xc6: return bin(u(4));
+        case 0xca: v = view.getFloat32(pos); pos += 4; return v;
+        case 0xcb: v = view.getFloat64(pos); pos += 8; return v;
+        case 0xcc: return u(1);
+        case 0xcd: return u(2);
+        case 0xce: return u(4);
+        case 0xcf: return u(8);
+        case 0xd0: v = view.getInt8(pos); pos += 1; return v;
+        case 0xd1: v = view.getInt16(pos); pos += 2; return v;
+        case 0xd2: v = view.getInt32(pos); pos += 4; return v;
+        case 0xd3: v = view.getInt32(pos) * 4294967296 + view.getUint32(pos + 4); pos += 8; return v;
+        case 0xd9: return str(u(1));
+        case 0xda: return str(u(2));
+        case 0xdb: return str(u(4));
+        case 0xdc: return arr(u(2));
+        case 0xdd: return arr(u(4));
+        case 0xde: return map(u(2));
+        case 0xdf: return map(u(4));
+      }
+      throw new Error('MessagePack: desteklenmeyen tip 0x' + b.toString(16));
+    }
+    return read();
+  }
+};
+
+// Oturum: "joined" ile gelen jeton sekme kapanana kadar saklanır; bağlantı
+// koparsa ya da sayfa yenilenirse "resume" ile aynı oyuncuya dönülür
+var LanSession = {
+  key: function () { return 'klan:' + location.pathname + location.search; },
+  token: function () {
+    try { return sessionStorage.getItem(this.key()); } catch (e) { return null; }
+  },
+  save: function (msg) {
+    if (msg.token) try { sessionStorage.setItem(this.key(), msg.token); } catch (e) {}
+  },
+  clear: function () {
+    try { sessionStorage.removeItem(this.key()); } catch (e) {}
+  },
+  resume: function (ws) {
+    var token = this.token();
+    if (token) ws.send(JSON.stringify({type: 'resume', token: token}));
+    return !!token;
+  }
+};
+
+// Sunucu saati: bitiş zamanları (epoch ms) sunucu saatine göredir
+var LanClock = {
+  offset: 0,
+  sync: function (serverNow) { this.offset = serverNow - Date.now(); },
+  now: function () { return Date.now() + this.offset; },
+  remaining: function (deadline) {
+    return deadline ? Math.max(0, Math.ceil((deadline - this.now()) / 1000)) : 0;
+  }
+};
+
+// Durum senkronizasyonu: tam durum + yamalar
+var LanState = {
+  state: null,
+  syncing: false,
+  apply: function (msg, ws) {
+    if (msg.type === 'state') {
+      this.state = msg;
+      this.syncing = false;
+      return msg;
+    }
+    if (msg.type !== 'state_patch') return null;
+    var s = this.state;
+    if (!s || msg.base !== s.v) {
+      if (!this.syncing && ws && ws.readyState === 1) {
+        this.syncing = true;
+        ws.send(JSON.stringify({type: 'state_sync'}));
+      }
+      return null;
+    }
+    var k, i;
+    if (msg.set) for (k in msg.set) s[k] = msg.set[k];
+    if (msg.append) for (k in msg.append) s[k] = (s[k] || []).concat(msg.append[k]);
+    if (msg.items) for (k in msg.items) {
+      var ops = msg.items[k], list = s[k] || [], byId = {};
+      var removed = {};
+      for (i = 0; i < (ops.remove || []).length; i++) removed[ops.remove[i]] = true;
+      list = list.filter(function (x) { return !removed[x.id]; });
+      for (i = 0; i < list.length; i++) byId[list[i].id] = i;
+      for (i = 0; i < (ops.upsert || []).length; i++) {
+        var item = ops.upsert[i];
+        if (item.id in byId) list[byId[item.id]] = item; else list.push(item);
+      }
+      s[k] = list;
+    }
+    if (msg.del) for (i = 0; i < msg.del.length; i++) delete s[msg.del[i]];
+    s.v = msg.v;
+    return s;
+  }
+};
+"""
+
+async def state_client_js(request):
+    return web.Response(text=STATE_CLIENT_JS, content_type="application/javascript")
+
+def mount_game(app, game=None, prefix="", index_html=None):
+    """Oyunu uygulamada prefix altına bağla: sayfa, /ws ve /lan_state.js"""
+    index_html = game.index_html if game else index_html
+
     if index_html:
         async def index(request):
             return web.Response(text=index_html, content_type="text/html")
-        app.router.add_get("/", index)
-    
-    app.router.add_get("/ws", ws_handler)
+        app.router.add_get(prefix + "/", index)
+        if prefix:
+            # /tombala -> /tombala/ (sayfadaki göreli adresler için)
+            async def redirect(request):
+                raise web.HTTPFound(prefix + "/" + (f"?{request.query_string}" if request.query_string else ""))
+            app.router.add_get(prefix, redirect)
+
+    async def game_ws(request):
+        return await ws_handler(request, game)
+
+    app.router.add_get(prefix + "/lan_state.js", state_client_js)
+    app.router.add_get(prefix + "/ws", game_ws)
+
+def create_app(index_html=None, game=None):
+    """LAN server uygulaması oluştur (tek oyun, kök adreste)"""
+    app = web.Application()
+    mount_game(app, game, index_html=index_html)
     return app
 
-def run_server(app=None, port=PORT):
-    """Sunucuyu başlat"""
-    import socket
-    import asyncio
-    import sys
-    
-    if app is None:
-        app = create_app()
-    
-    # Windows için asyncio policy ayarla
+HUB_HTML = """<!doctype html>
+<html lang="tr">
+<head>
+  <meta charset="utf-8">
+  <title>K-LAN Oyun Merkezi</title>
+  <meta name="viewport" content="width=device-width,initial-scale=1"/>
+  <style>
+    body{{font-family:system-ui,Segoe UI,Roboto,Helvetica,Arial,sans-serif;margin:0;background:#0B0F19;color:#fff}}
+    .wrap{{max-width:520px;margin:0 auto;padding:40px 20px}}
+    h1{{text-align:center;letter-spacing:2px}}
+    a{{display:block;padding:18px 20px;margin:12px 0;border-radius:14px;background:#1F2937;color:#fff;text-decoration:none;font-size:1.2em;border:1px solid #374151}}
+    a:hover{{background:#374151}}
+  </style>
+</head>
+<body>
+  <div class="wrap">
+    <h1>K-LAN</h1>
+    {links}
+  </div>
+</body>
+</html>
+"""
+
+def create_hub_app(games=None):
+    """Tüm oyunları tek uygulamada sun: /tombala/, /kkm/, ..."""
+    if games is None:
+        games = discover_games()
+    app = web.Application()
+    links = "\n    ".join(f'<a href="/{g.name}/">🎲 {g.title}</a>' for g in games)
+    hub_html = HUB_HTML.format(links=links)
+
+    async def hub(request):
+        return web.Response(text=hub_html, content_type="text/html")
+    app.router.add_get("/", hub)
+
+    for game in games:
+        mount_game(app, game, prefix="/" + game.name)
+    return app
+
+def server_args(argv=None):
+    """Komut satırı ayarları: --workers N, --loop asyncio|uvloop|auto"""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--loop", choices=EVENT_LOOPS, default=EVENT_LOOP)
+    args, _ = parser.parse_known_args(argv)
+    return args
+
+def use_event_loop(name=None):
+    """Olay döngüsünü seç; kullanılan döngünün adını döndürür"""
+    name = name or EVENT_LOOP
+    if name not in EVENT_LOOPS:
+        raise ValueError(f"Bilinmeyen olay döngüsü: {name}")
     if sys.platform == 'win32':
+        # Windows için asyncio policy ayarla (uvloop Windows'u desteklemez)
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    
+        return "asyncio"
+    if name != "asyncio" and uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return "uvloop"
+    if name == "uvloop":
+        print("⚠️  uvloop kurulu değil (pip install uvloop), asyncio ile devam ediliyor")
+    return "asyncio"
+
+def _print_banner(port, workers=1, loop="asyncio"):
     hostname = socket.gethostname()
     local_ip = socket.gethostbyname(hostname)
     
@@ -138,10 +1462,74 @@ def run_server(app=None, port=PORT):
     print(f"📍 Yerel erişim: http://localhost:{port}")
     print(f"🌍 LAN erişimi: http://{local_ip}:{port}")
     print(f"🔗 Diğer cihazlar bu adresi kullanabilir: http://{local_ip}:{port}")
+    if workers > 1:
+        print(f"⚙️  {workers} işçi süreç (SO_REUSEPORT)")
+    if loop != "asyncio":
+        print(f"⚡ Olay döngüsü: {loop}")
     print(f"⚠️  Eğer bağlanamıyorsa Windows Güvenlik Duvarı'nı kontrol edin")
     print("-" * 50)
+
+def _run_worker(app, port, worker, sockets):
+    global _worker_id, _worker_count, _worker_sockets
+    _worker_id = worker
+    _worker_count = len(sockets)
+    _worker_sockets = sockets
+    app.on_cleanup.append(_close_worker_sessions)
+    try:
+        web.run_app(app, host=HOST, port=port, path=sockets[worker],
+                    reuse_port=True, print=None, handle_signals=True)
+    except KeyboardInterrupt:
+        pass
+
+def run_workers(app, port, workers):
+    """Aynı portta `workers` süreç çalıştır; odalar işçilere özetle dağıtılır"""
+    import multiprocessing
+
+    tag = f"klan-{port}-{os.getpid()}"
+    sockets = [os.path.join(tempfile.gettempdir(), f"{tag}-{i}.sock") for i in range(workers)]
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_run_worker, args=(app, port, i, sockets), daemon=True)
+             for i in range(workers)]
+    for proc in procs:
+        proc.start()
+    # SIGTERM'de de işçileri durdurup soketleri temizle
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs:
+            if proc.is_alive():
+                proc.terminate()
+        for path in sockets:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+def run_server(app=None, port=PORT, workers=None, loop=None):
+    """Sunucuyu başlat"""
+    if app is None:
+        app = create_app()
+    args = server_args()
+    if workers is None:
+        workers = args.workers
+    
+    # İşçiler fork ile başladığından seçilen döngü politikası onlara da geçer
+    loop = use_event_loop(loop or args.loop)
+    
+    if workers > 1 and (sys.platform == 'win32' or not hasattr(socket, "SO_REUSEPORT")):
+        print("⚠️  Bu sistemde SO_REUSEPORT yok, tek süreçle devam ediliyor")
+        workers = 1
+    
+    _print_banner(port, workers, loop)
     
-    web.run_app(app, host=HOST, port=port, print=None)
+    if workers > 1:
+        run_workers(app, port, workers)
+    else:
+        web.run_app(app, host=HOST, port=port, print=None)
 
 if __name__ == "__main__":
     print("⚠️  Bu dosya doğrudan çalıştırılamaz. Bir oyun dosyası kullanın.")
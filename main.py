@@ -245,6 +245,15 @@ class LANGameController:
         
         if not self.games:
             self.games_listbox.insert(tk.END, "❌ Oyun bulunamadı!")
+            return
+        
+        # Tüm oyunlar tek sunucuda (hub.py)
+        self.games.append({
+            "name": "TÜM OYUNLAR",
+            "file": "hub.py",
+            "path": os.path.join(os.path.dirname(__file__), "hub.py")
+        })
+        self.games_listbox.insert(tk.END, "🌐 TÜM OYUNLAR (tek sunucu)")
     
     def on_game_select(self, event):
         """Oyun seçildiğinde"""